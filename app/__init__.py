@@ -8,6 +8,7 @@ from flask_talisman import Talisman
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_apscheduler import APScheduler
+from flask_caching import Cache
 from config import config
 
 db = SQLAlchemy()
@@ -18,8 +19,9 @@ migrate = Migrate()
 csrf = CSRFProtect()
 limiter = Limiter(key_func=get_remote_address)
 scheduler = APScheduler()
+cache = Cache()
 
-def create_app(config_name):
+def create_app(config_name, start_scheduler=True):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
@@ -30,8 +32,16 @@ def create_app(config_name):
     migrate.init_app(app, db)
     csrf.init_app(app)
     limiter.init_app(app)
+    cache.init_app(app)
+    from . import assets, compression, images, rollup
+    rollup.init_app(app)
+    images.init_app(app)
+    assets.init_app(app)
+    compression.init_app(app)
     scheduler.init_app(app)
-    scheduler.start()
+    from .leader import running_cli_command, start_scheduler as start_scheduler_leader
+    if start_scheduler and not app.testing and not running_cli_command():
+        start_scheduler_leader(app, scheduler)
 
     # Content Security Policy configuration
     csp = {
@@ -68,7 +78,7 @@ def create_app(config_name):
     
     Talisman(app, 
              content_security_policy=csp, 
-             force_https=not app.config.get('DEBUG', True)
+             force_https=not (app.config.get('DEBUG', True) or app.config.get('TESTING'))
     )
 
     # Register blueprints
@@ -84,27 +94,19 @@ def create_app(config_name):
     from .routes.api import api as api_blueprint
     app.register_blueprint(api_blueprint, url_prefix='/api')
 
+    from .commands import register_commands
+    register_commands(app)
+
     # Inject site-wide settings into templates (safe if DB not ready)
     from .models import Settings
 
     @app.context_processor
     def inject_site_settings():
+        # Cached per worker and revalidated once per request (see Settings._cache)
         try:
-            settings = Settings.get_all() or {}
+            parsed = Settings.get_all(parse_json=True)
         except Exception:
-            settings = {}
-
-        # Parse some JSON-encoded settings for templates
-        import json
-        parsed = {}
-        for k, v in settings.items():
-            if k in ('OPENING_HOURS', 'CLOSED_DATES', 'NOTIFICATION_EMAILS') and v:
-                try:
-                    parsed[k] = json.loads(v)
-                except Exception:
-                    parsed[k] = None
-            else:
-                parsed[k] = v
+            parsed = {}
 
         # Provide convenient accessors with defaults
         site = {
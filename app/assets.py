@@ -0,0 +1,134 @@
+"""Fingerprinted static assets, served precompressed and cached for good.
+
+At startup every file under static/ (uploads aside, they are content
+addressed already) is hashed into a manifest. Templates link assets with
+asset_url('css/output.css'), which gives /static/css/output.<hash>.css:
+the name changes whenever the content does, so those URLs are served
+with a one year, immutable Cache-Control.
+
+`flask build-assets` writes .gz (and .br, when the optional brotli
+package is installed) next to compressible assets. They are sent instead
+of the original to clients that accept them, as long as they are newer.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Already content addressed (see app.images) and written at runtime
+SKIP_FOLDERS = ('uploads',)
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.xml')
+# Preferred first; the extension of the sibling file for each encoding
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _asset_files(folder):
+    for root, dirs, files in os.walk(folder):
+        if root == folder:
+            dirs[:] = [d for d in dirs if d not in SKIP_FOLDERS]
+        for name in files:
+            if name.startswith('.') or name.endswith(tuple(ext for _, ext in ENCODINGS)):
+                continue
+            yield os.path.relpath(os.path.join(root, name), folder).replace(os.sep, '/')
+
+
+def fingerprint(path, digest):
+    """'css/output.css' -> 'css/output.<digest>.css'."""
+    stem, ext = os.path.splitext(path)
+    return f'{stem}.{digest}{ext}'
+
+
+class Manifest:
+    """Fingerprints of the static files and their up-to-date compressed siblings."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.urls = {}  # path -> fingerprinted path
+        self.sources = {}  # fingerprinted path -> path
+        self.encodings = {}  # path -> [(encoding, sibling path)], preferred first
+        for path in _asset_files(folder):
+            full = os.path.join(folder, path)
+            with open(full, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:12]
+            self.urls[path] = fingerprint(path, digest)
+            self.sources[self.urls[path]] = path
+            mtime = os.path.getmtime(full)
+            # A sibling older than its source was built from a previous version
+            self.encodings[path] = [
+                (encoding, path + ext) for encoding, ext in ENCODINGS
+                if os.path.exists(full + ext) and os.path.getmtime(full + ext) >= mtime
+            ]
+        # Changes whenever any fingerprint does (see http_cache.release_token)
+        self.digest = hashlib.sha256(repr(sorted(self.urls.items())).encode()).hexdigest()[:16]
+
+
+def asset_url(filename):
+    """URL of a static file, fingerprinted when ASSET_FINGERPRINTS is on."""
+    manifest = current_app.extensions.get('asset_manifest')
+    if manifest is not None and filename in manifest.urls:
+        return url_for('static', filename=manifest.urls[filename])
+    return url_for('static', filename=filename)
+
+
+def send_static(filename):
+    """The static view: resolves fingerprinted names and picks a precompressed sibling."""
+    app = current_app
+    manifest = app.extensions.get('asset_manifest')
+    if manifest is None:
+        return app.send_static_file(filename)
+
+    source = manifest.sources.get(filename)
+    path = source or filename
+    served, encoding = path, None
+    siblings = manifest.encodings.get(path, ())
+    for candidate, sibling in siblings:
+        if request.accept_encodings[candidate]:
+            served, encoding = sibling, candidate
+            break
+
+    max_age = IMMUTABLE_MAX_AGE if source else app.get_send_file_max_age(path)
+    response = send_from_directory(app.static_folder, served, max_age=max_age,
+                                   mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if siblings:
+        response.vary.add('Accept-Encoding')
+    if source:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
+
+
+def build(folder, echo=print):
+    """Write the .gz/.br siblings of compressible static files; returns how many were written."""
+    written = 0
+    for path in _asset_files(folder):
+        if not path.endswith(COMPRESSIBLE):
+            continue
+        full = os.path.join(folder, path)
+        with open(full, 'rb') as f:
+            data = f.read()
+        compressors = [('.gz', lambda d: gzip.compress(d, 9, mtime=0))]
+        if brotli is not None:
+            compressors.append(('.br', lambda d: brotli.compress(d, quality=11)))
+        for ext, compress in compressors:
+            compressed = compress(data)
+            with open(full + ext, 'wb') as f:
+                f.write(compressed)
+            written += 1
+            echo(f'{path}{ext}: {len(data)} -> {len(compressed)} bytes')
+    return written
+
+
+def init_app(app):
+    app.add_template_global(asset_url)
+    if app.config['ASSET_FINGERPRINTS'] and app.static_folder:
+        app.extensions['asset_manifest'] = Manifest(app.static_folder)
+        app.view_functions['static'] = send_static
@@ -0,0 +1,59 @@
+"""Flask CLI commands (`flask <command>`)."""
+from datetime import datetime
+import click
+
+
+def register_commands(app):
+
+    @app.cli.command('rebuild-occupancy')
+    @click.option('--date', 'day', help='Only rebuild this date (YYYY-MM-DD).')
+    def rebuild_occupancy(day):
+        """Regenerate slot_occupancy from reservations and report drifted dates."""
+        from . import occupancy
+        day = datetime.strptime(day, '%Y-%m-%d').date() if day else None
+        mismatched = occupancy.rebuild(day=day)
+        for d in mismatched:
+            click.echo(f'Occupancy drift corrected for {d.isoformat()}')
+        click.echo(f'Occupancy rebuilt ({len(mismatched)} date(s) out of sync).')
+
+    @app.cli.command('send-reminders')
+    @click.option('--date', 'day', help='Bookings date to remind (YYYY-MM-DD), tomorrow by default.')
+    def send_reminders(day):
+        """Send the reminders still due; safe to re-run after an interruption."""
+        from datetime import timedelta
+        from .reminders import send_due_reminders
+        day = datetime.strptime(day, '%Y-%m-%d').date() if day else datetime.now().date() + timedelta(days=1)
+        report = send_due_reminders(day)
+        for reservation_id, error in report.failed.items():
+            click.echo(f'Reminder failed for reservation {reservation_id}: {error}')
+        click.echo(f'Reminders for {day.isoformat()}: {report.summary()}')
+
+    @app.cli.command('backfill-daily-stats')
+    @click.option('--since', help='Only rebuild dates on or after this one (YYYY-MM-DD).')
+    def backfill_daily_stats(since):
+        """Rebuild the daily_stats rollup from reservations."""
+        from . import rollup
+        since = datetime.strptime(since, '%Y-%m-%d').date() if since else None
+        days = rollup.refresh(since=since)
+        click.echo(f'Daily stats rebuilt for {days} day(s).')
+
+    @app.cli.command('gc-uploads')
+    @click.option('--dry-run', is_flag=True, help='Only list the files that would be removed.')
+    @click.option('--grace-hours', default=24, show_default=True,
+                  help='Keep files modified this recently (uploads in progress).')
+    def gc_uploads(dry_run, grace_hours):
+        """Remove uploaded images no menu item references any more."""
+        from .images import collect_garbage
+        removed = collect_garbage(grace_hours * 3600, dry_run=dry_run)
+        for name in removed:
+            click.echo(f'{"Would remove" if dry_run else "Removed"} uploads/{name}')
+        click.echo(f'{len(removed)} unreferenced upload(s) {"found" if dry_run else "removed"}.')
+
+    @app.cli.command('build-assets')
+    def build_assets():
+        """Write precompressed .gz/.br copies of the static assets (after each CSS build)."""
+        from .assets import brotli, build
+        written = build(app.static_folder, echo=click.echo)
+        if brotli is None:
+            click.echo('brotli is not installed: only .gz files were written.')
+        click.echo(f'{written} compressed file(s) written.')
@@ -0,0 +1,231 @@
+"""Response compression: a WSGI middleware, plus precompressed cached fragments.
+
+CompressionMiddleware gzips (or brotli-compresses, when the optional brotli
+package is installed) text responses of at least COMPRESS_MIN_SIZE bytes
+for clients that accept it. Streamed responses are compressed chunk by
+chunk and flushed as they go, so infinite scroll pages and exports still
+reach the client progressively. Responses that already carry a
+Content-Encoding (gzipped exports, precompressed static assets and
+fragments) are passed through untouched.
+
+A response whose bytes depend on Accept-Encoding gets `Vary:
+Accept-Encoding` and a weak ETag, including when it is too short to be
+worth compressing and on the 304s answering it, so a cache always sees
+the validator the 200 would have carried.
+
+Cached fragments store their compressed bytes next to the HTML
+(compress_variants), so a cache hit is answered by precompressed_response
+without compressing anything.
+"""
+import zlib
+from flask import current_app, request
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/xml', 'text/javascript',
+    'application/javascript', 'application/json', 'application/xml', 'application/x-ndjson',
+    'image/svg+xml',
+)
+# Fragments are compressed once per cache fill, so they can afford the slow levels
+FRAGMENT_GZIP_LEVEL = 9
+FRAGMENT_BROTLI_QUALITY = 9
+
+
+def supported_encodings():
+    """Encodings we can produce, preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding, available=None):
+    """The encoding to use for an Accept-Encoding header value, or None for identity."""
+    if not accept_encoding:
+        return None
+    accepted = parse_accept_header(accept_encoding)
+    for encoding in supported_encodings():
+        if accepted[encoding] and (available is None or encoding in available):
+            return encoding
+    return None
+
+
+def compress(data, encoding, level):
+    """Compress `data` in one go; `level` is the gzip level or the brotli quality."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def mark_negotiated(headers):
+    """Vary on Accept-Encoding and weaken the ETag: the same content may be sent as other bytes."""
+    vary = headers.get('Vary')
+    if not vary:
+        headers['Vary'] = 'Accept-Encoding'
+    elif 'accept-encoding' not in vary.lower():
+        headers['Vary'] = f'{vary}, Accept-Encoding'
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        headers['ETag'] = f'W/{etag}'
+
+
+class StreamCompressor:
+    """Compresses a body chunk by chunk, flushing each chunk so it can be sent right away."""
+
+    def __init__(self, encoding, level):
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=level)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """Compress the responses of `wsgi_app` that are worth it; see the module docstring."""
+
+    def __init__(self, wsgi_app, min_size=500, level=6, brotli_quality=4, mimetypes=COMPRESSIBLE_MIMETYPES):
+        self.wsgi_app = wsgi_app
+        self.min_size = min_size
+        self.levels = {'gzip': level, 'br': brotli_quality}
+        self.mimetypes = mimetypes
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ.get('REQUEST_METHOD') != 'HEAD':
+            encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return self.wsgi_app(environ, start_response)
+
+        started = {}
+
+        def capture(status, headers, exc_info=None):
+            started.update(status=status, headers=headers, exc_info=exc_info)
+            return self._write
+
+        return self._respond(self.wsgi_app(environ, capture), started, encoding, start_response)
+
+    @staticmethod
+    def _write(data):
+        raise RuntimeError('CompressionMiddleware does not support the WSGI write() callable')
+
+    def _negotiable(self, status, headers):
+        if not status.startswith('200') or 'Content-Encoding' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        mimetype = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        return mimetype in self.mimetypes
+
+    def _respond(self, app_iter, started, encoding, start_response):
+        try:
+            chunks = iter(app_iter)
+            buffered = []
+            # The application may only call start_response when it yields its first chunk
+            while 'status' not in started:
+                buffered.append(next(chunks))
+            status, headers = started['status'], Headers(started['headers'])
+            negotiable = self._negotiable(status, headers)
+            if negotiable:
+                # Even when it turns out too short to compress, so that its 304s agree
+                mark_negotiated(headers)
+            length = headers.get('Content-Length')
+            if not negotiable or (length is not None and int(length) < self.min_size):
+                start_response(status, headers.to_wsgi_list(), started['exc_info'])
+                yield from buffered
+                yield from chunks
+                return
+
+            # Hold back up to min_size bytes: shorter bodies are sent as they are
+            size = sum(map(len, buffered))
+            while size < self.min_size:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    body = b''.join(buffered)
+                    headers['Content-Length'] = str(len(body))
+                    start_response(status, headers.to_wsgi_list(), started['exc_info'])
+                    yield body
+                    return
+                buffered.append(chunk)
+                size += len(chunk)
+
+            streamed = 'Content-Length' not in headers
+            headers['Content-Encoding'] = encoding
+
+            if not streamed:
+                body = compress(b''.join(buffered) + b''.join(chunks), encoding, self.levels[encoding])
+                headers['Content-Length'] = str(len(body))
+                start_response(status, headers.to_wsgi_list(), started['exc_info'])
+                yield body
+                return
+
+            start_response(status, headers.to_wsgi_list(), started['exc_info'])
+            compressor = StreamCompressor(encoding, self.levels[encoding])
+            data = compressor.chunk(b''.join(buffered))
+            if data:
+                yield data
+            for chunk in chunks:
+                data = compressor.chunk(chunk)
+                if data:
+                    yield data
+            yield compressor.finish()
+        finally:
+            close = getattr(app_iter, 'close', None)
+            if close is not None:
+                close()
+
+
+def compress_variants(body, min_size=None):
+    """{encoding: bytes} of a fragment to cache: 'identity', plus compressed copies when worth it."""
+    data = body.encode('utf-8') if isinstance(body, str) else body
+    variants = {'identity': data}
+    if min_size is None:
+        min_size = current_app.config['COMPRESS_MIN_SIZE']
+    if len(data) >= min_size:
+        levels = {'gzip': FRAGMENT_GZIP_LEVEL, 'br': FRAGMENT_BROTLI_QUALITY}
+        for encoding in supported_encodings():
+            variants[encoding] = compress(data, encoding, levels[encoding])
+    return variants
+
+
+def precompressed_response(variants, mimetype='text/html'):
+    """Response with the best variant of compress_variants() this request accepts."""
+    encoding = negotiate(request.headers.get('Accept-Encoding'), available=variants)
+    response = current_app.response_class(variants[encoding or 'identity'], mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if len(variants) > 1:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def _negotiated_not_modified(response):
+    # The 200 got its validators from CompressionMiddleware; WSGI headers of a
+    # 304 no longer say which type it stands for, so this runs in Flask
+    if (response.status_code == 304 and request.method != 'HEAD' and not response.content_encoding
+            and not response.cache_control.no_transform and response.mimetype in COMPRESSIBLE_MIMETYPES
+            and negotiate(request.headers.get('Accept-Encoding'))):
+        mark_negotiated(response.headers)
+    return response
+
+
+def init_app(app):
+    if app.config['COMPRESS_RESPONSES']:
+        app.after_request(_negotiated_not_modified)
+        app.wsgi_app = CompressionMiddleware(app.wsgi_app, min_size=app.config['COMPRESS_MIN_SIZE'],
+                                             level=app.config['COMPRESS_LEVEL'],
+                                             brotli_quality=app.config['COMPRESS_BROTLI_QUALITY'])
@@ -0,0 +1,253 @@
+"""Reservation exports, streamed page by page so memory stays flat."""
+import csv
+import io
+import json
+import struct
+import zlib
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import false, func, tuple_
+from .models import Reservation
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+EXPORT_BATCH_SIZE = 1000
+# Changes this recent are left to the next delta: a transaction stamped a bit
+# earlier may not have committed yet, and must not fall behind the cursor.
+SETTLE_SECONDS = 5
+STATUSES = ('pending', 'confirmed', 'cancelled', 'completed')
+
+CSV_COLUMNS = (
+    ('ID', Reservation.id),
+    ('Date', Reservation.date),
+    ('Heure', Reservation.time),
+    ('Nom', Reservation.last_name),
+    ('Prénom', Reservation.first_name),
+    ('Email', Reservation.email),
+    ('Téléphone', Reservation.phone),
+    ('Couverts', Reservation.guests),
+    ('Statut', Reservation.status),
+    ('Créé le', Reservation.created_at),
+)
+
+
+def export_filters(args):
+    """Build filter criteria from ?date_from=, ?date_to= (YYYY-MM-DD) and ?status=.
+
+    Raises ValueError on a malformed date or unknown status.
+    """
+    criteria = []
+    if args.get('date_from'):
+        criteria.append(Reservation.date >= datetime.strptime(args['date_from'], '%Y-%m-%d').date())
+    if args.get('date_to'):
+        criteria.append(Reservation.date <= datetime.strptime(args['date_to'], '%Y-%m-%d').date())
+    if args.get('status'):
+        if args['status'] not in STATUSES:
+            raise ValueError(f"unknown status {args['status']!r}")
+        criteria.append(Reservation.status == args['status'])
+    return criteria
+
+
+def iter_pages(columns, criteria=(), keys=(Reservation.date, Reservation.id), descending=True,
+               batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of `columns` tuples for matching reservations, ordered by `keys`.
+
+    Pages with a keyset on `keys` (which must end with a unique column)
+    rather than OFFSET, so every page costs the same however deep into the
+    history it is, and only plain tuples of one page are held at a time.
+    """
+    query = Reservation.query.with_entities(*keys, *columns).filter(*criteria)
+    query = query.order_by(*(k.desc() if descending else k.asc() for k in keys))
+    width = len(keys)
+    after = None
+    while True:
+        page = query
+        if after is not None:
+            key = tuple_(*keys)
+            page = page.filter(key < after if descending else key > after)
+        rows = page.limit(batch_size).all()
+        if rows:
+            yield [tuple(row[width:]) for row in rows]
+        if len(rows) < batch_size:
+            return
+        after = tuple(rows[-1][:width])
+
+
+def iter_rows(columns, criteria=(), batch_size=EXPORT_BATCH_SIZE):
+    """Yield tuples of `columns` for matching reservations, newest date first."""
+    for page in iter_pages(columns, criteria, batch_size=batch_size):
+        yield from page
+
+
+def iter_csv(criteria=(), batch_size=EXPORT_BATCH_SIZE):
+    """Yield the CSV export in chunks of one page of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in CSV_COLUMNS])
+    count = 0
+    for row in iter_rows([column for _, column in CSV_COLUMNS], criteria, batch_size):
+        writer.writerow(row)
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzip_stream(chunks):
+    """Gzip a stream of text or bytes chunks on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# ---- Incremental exports for the analytics pipeline ----
+
+# When a reservation last changed (updated_at is only set on update)
+CHANGED_AT = func.coalesce(Reservation.updated_at, Reservation.created_at)
+CHANGE_KEYS = (CHANGED_AT, Reservation.id)
+
+RECORD_FIELDS = (
+    ('id', Reservation.id),
+    ('date', Reservation.date),
+    ('time', Reservation.time),
+    ('guests', Reservation.guests),
+    ('first_name', Reservation.first_name),
+    ('last_name', Reservation.last_name),
+    ('email', Reservation.email),
+    ('phone', Reservation.phone),
+    ('status', Reservation.status),
+    ('special_requests', Reservation.special_requests),
+    ('created_at', Reservation.created_at),
+    ('updated_at', Reservation.updated_at),
+)
+
+
+def encode_cursor(changed_at, reservation_id):
+    return f'{changed_at.isoformat()}_{reservation_id}'
+
+
+def decode_cursor(token):
+    """Parse a cursor from encode_cursor(); raises ValueError if malformed."""
+    stamp, _, reservation_id = token.rpartition('_')
+    return datetime.fromisoformat(stamp), int(reservation_id)
+
+
+def change_window(since=None):
+    """Return (criteria, cursor) selecting the reservations changed after `since`.
+
+    The window ends at the latest settled change, whose cursor is returned:
+    pass it as `since` next time to get only what changed in between. The
+    cursor is `since` itself when nothing new settled.
+    """
+    criteria = [CHANGED_AT <= datetime.utcnow() - timedelta(seconds=SETTLE_SECONDS)]
+    if since:
+        criteria.append(tuple_(*CHANGE_KEYS) > decode_cursor(since))
+    latest = (Reservation.query.with_entities(*CHANGE_KEYS).filter(*criteria)
+              .order_by(CHANGED_AT.desc(), Reservation.id.desc()).first())
+    if latest is None:
+        return criteria + [false()], since
+    criteria.append(tuple_(*CHANGE_KEYS) <= tuple(latest))
+    return criteria, encode_cursor(*latest)
+
+
+def _plain(value):
+    if isinstance(value, (date, time)):  # datetime is a date
+        return value.isoformat()
+    return value
+
+
+def iter_change_pages(criteria=(), batch_size=EXPORT_BATCH_SIZE):
+    """Pages of RECORD_FIELDS tuples, oldest change first."""
+    return iter_pages([column for _, column in RECORD_FIELDS], criteria, keys=CHANGE_KEYS,
+                      descending=False, batch_size=batch_size)
+
+
+def iter_ndjson(criteria=(), batch_size=EXPORT_BATCH_SIZE):
+    """One JSON object per reservation and line, oldest change first."""
+    names = [name for name, _ in RECORD_FIELDS]
+    for page in iter_change_pages(criteria, batch_size):
+        yield ''.join(
+            json.dumps(dict(zip(names, map(_plain, row))), ensure_ascii=False, separators=(',', ':')) + '\n'
+            for row in page
+        )
+
+
+# Fallback columnar format, used when pyarrow is not installed:
+#   COLUMNAR_MAGIC, then one frame per page: 4-byte big-endian length followed
+#   by zlib-compressed JSON {"field": [values...], ...}; a zero length ends it.
+COLUMNAR_MAGIC = b'LAGCOL1\n'
+
+
+def columnar_format():
+    """(mimetype, file extension) of what iter_columnar() produces here."""
+    if pyarrow is not None:
+        return 'application/vnd.apache.arrow.stream', 'arrows'
+    return 'application/octet-stream', 'lagcol'
+
+
+def iter_columnar(criteria=(), batch_size=EXPORT_BATCH_SIZE):
+    """Column-oriented export: an Arrow IPC stream, or the LAGCOL1 fallback."""
+    pages = iter_change_pages(criteria, batch_size)
+    if pyarrow is not None:
+        return _iter_arrow(pages)
+    return _iter_packed(pages)
+
+
+def _arrow_schema():
+    string = pyarrow.string()
+    stamp = pyarrow.timestamp('us')
+    types = {
+        'id': pyarrow.int64(), 'date': pyarrow.date32(), 'time': pyarrow.time64('us'),
+        'guests': pyarrow.int32(), 'created_at': stamp, 'updated_at': stamp,
+    }
+    return pyarrow.schema([(name, types.get(name, string)) for name, _ in RECORD_FIELDS])
+
+
+def _iter_arrow(pages):
+    schema = _arrow_schema()
+    sink = io.BytesIO()
+    writer = pyarrow.ipc.new_stream(sink, schema)
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    for page in pages:
+        columns = [list(column) for column in zip(*page)]
+        writer.write_batch(pyarrow.record_batch(
+            [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        ))
+        yield drain()
+    writer.close()
+    yield drain()
+
+
+def _iter_packed(pages):
+    names = [name for name, _ in RECORD_FIELDS]
+    yield COLUMNAR_MAGIC
+    for page in pages:
+        columns = {name: [_plain(v) for v in values] for name, values in zip(names, zip(*page))}
+        frame = zlib.compress(json.dumps(columns, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        yield struct.pack('>I', len(frame)) + frame
+    yield struct.pack('>I', 0)
+
+
+def read_columnar(stream):
+    """Yield the {field: [values]} pages of a LAGCOL1 export read from `stream`."""
+    if stream.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError('not a LAGCOL1 export')
+    while True:
+        (length,) = struct.unpack('>I', stream.read(4))
+        if not length:
+            return
+        yield json.loads(zlib.decompress(stream.read(length)))
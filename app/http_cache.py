@@ -0,0 +1,61 @@
+"""Conditional GET (ETag / Last-Modified) for pages and fragments derived from versioned data."""
+import hashlib
+import os
+from flask import current_app, make_response, request, session
+from werkzeug.http import is_resource_modified
+
+
+def release_token():
+    """Digest of the templates and asset fingerprints, so a deploy changes every tag even if the data did not."""
+    token = current_app.extensions.get('release_token')
+    if token is None:
+        digest = hashlib.sha1()
+        template_dir = os.path.join(current_app.root_path, current_app.template_folder)
+        for root, dirs, files in os.walk(template_dir):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, template_dir).encode())
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+        token = current_app.extensions['release_token'] = digest.hexdigest()[:16]
+    # Pages link fingerprinted asset URLs: a rebuilt output.css must change their tags too
+    manifest = current_app.extensions.get('asset_manifest')
+    if manifest is not None:
+        token = f'{token}:{manifest.digest}'
+    return token
+
+
+def conditional_response(render, *versions, last_modified=None, mimetype=None):
+    """Answer 304 when the client already holds this version, else call `render()`.
+
+    The strong ETag is derived from `versions` (e.g. Settings.version()), not
+    from the body, so unchanged pages are never rendered. Responses carrying
+    flashed messages are one-off and are neither tagged nor cached.
+    """
+    if session.get('_flashes'):
+        response = make_response(render())
+        response.cache_control.no_store = True
+        if mimetype:
+            response.mimetype = mimetype
+        return response
+
+    parts = [release_token(), request.host_url, *map(str, versions)]
+    etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0)
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+        if mimetype:
+            response.mimetype = mimetype
+    # Weak when precompressed: the same content may be sent as other bytes
+    response.set_etag(etag, weak=bool(response.content_encoding))
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Shared caches may keep the body but must revalidate on every use
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,419 @@
+"""Menu photo uploads: resized, re-encoded, metadata-free variants.
+
+An upload is decoded once, in a worker of a process pool, and written as a
+few widths (IMAGE_WIDTHS) in each of IMAGE_FORMATS that this Pillow build
+can encode. The variants are recorded on MenuItem.image_variants and served
+through `srcset`, so phones no longer download multi-MB originals.
+
+Variants are named after a hash of the upload and of the settings that
+produced them, so a name never changes content: the same photo uploaded
+twice is stored once, and browsers may cache uploads forever.
+`flask gc-uploads` removes the files no menu item uses any more.
+
+Views decorated with @image_upload stream their file parts straight into
+an UploadSink: a temporary file hashed as it is written, which stops
+storing the upload as soon as its magic bytes or its header's pixel
+dimensions rule it out, before anything is decoded. Uploads and the
+variants being rendered live in UPLOAD_TEMP_FOLDER, outside static/: only
+finished variants are moved into UPLOAD_FOLDER.
+"""
+import atexit
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import Request, current_app, request, url_for
+from PIL import Image, ImageCms, ImageOps, UnidentifiedImageError, features
+from .models import MenuItem
+
+# {hash}-{width}.{format}, as written by render_variants()
+HASHED_NAME = re.compile(r'^[0-9a-f]{32}-\d+\.[a-z]+$')
+KEEP_FILES = ('.gitkeep',)
+CHUNK_SIZE = 64 * 1024
+# Signatures of the image types we accept: (type, ((offset, bytes), ...))
+MAGIC_BYTES = (
+    ('jpeg', ((0, b'\xff\xd8\xff'),)),
+    ('png', ((0, b'\x89PNG\r\n\x1a\n'),)),
+    ('gif', ((0, b'GIF87a'),)),
+    ('gif', ((0, b'GIF89a'),)),
+    ('webp', ((0, b'RIFF'), (8, b'WEBP'))),
+    ('avif', ((4, b'ftypavif'),)),
+    ('avif', ((4, b'ftypavis'),)),
+)
+SNIFF_BYTES = 12
+# Written when this Pillow build can encode none of IMAGE_FORMATS
+FALLBACK_FORMAT = 'jpeg'
+# Header bytes searched for the pixel dimensions while streaming; JPEG
+# headers after a large EXIF block are checked once the upload is complete
+HEADER_BYTES = 256 * 1024
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class InvalidImage(ValueError):
+    """The upload is not an image Pillow can decode."""
+
+
+def available_formats(formats):
+    """The `formats` this Pillow build can write, in the same order; FALLBACK_FORMAT if none."""
+    return [fmt for fmt in formats if features.check(fmt)] or [FALLBACK_FORMAT]
+
+
+def _to_srgb(image):
+    # Browsers assume sRGB once the profile is stripped, so convert first
+    profile = image.info.get('icc_profile')
+    if profile:
+        try:
+            source = ImageCms.ImageCmsProfile(io.BytesIO(profile))
+            image = ImageCms.profileToProfile(image, source, ImageCms.createProfile('sRGB'),
+                                              outputMode=image.mode)
+        except (ImageCms.PyCMSError, OSError):
+            pass
+    return image
+
+
+def render_variants(source, folder, stem, widths, formats, quality):
+    """Write the variants of the image at `source` into `folder`; runs in the pool.
+
+    Widths larger than the image are capped to its own width (never
+    upscaled). Returns {format: [[width, filename], ...]}, narrowest first.
+    """
+    try:
+        image = Image.open(source)
+        image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise InvalidImage(str(e)) from e
+
+    # Apply the EXIF orientation before the EXIF block is dropped
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        transparent = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if transparent else 'RGB')
+    image = _to_srgb(image)
+
+    variants = {fmt: [] for fmt in formats}
+    for width in sorted({min(w, image.width) for w in widths}):
+        height = max(1, round(image.height * width / image.width))
+        variant = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+        # No EXIF (GPS, camera), ICC profile or XMP in what we serve
+        variant.info = {}
+        for fmt in formats:
+            filename = f'{stem}-{width}.{fmt}'
+            # JPEG has no alpha channel
+            frame = variant.convert('RGB') if fmt == 'jpeg' and variant.mode == 'RGBA' else variant
+            frame.save(os.path.join(folder, filename), format=fmt.upper(), quality=quality)
+            variants[fmt].append([width, filename])
+    return variants
+
+
+def _executor(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the workers must not inherit this process's threads and sockets
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def _drop_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    atexit.unregister(pool.shutdown)
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _discard(source, work):
+    # What a render that timed out read and wrote, once it is over
+    try:
+        os.remove(source)
+    except FileNotFoundError:
+        pass
+    shutil.rmtree(work, ignore_errors=True)
+
+
+def _render_in_pool(sink, args, workers, timeout):
+    """render_variants(*args) in the process pool, waiting at most `timeout` seconds."""
+    pool = _executor(workers)
+    try:
+        future = pool.submit(render_variants, *args)
+        return future.result(timeout=timeout)
+    except BrokenProcessPool as e:
+        # A worker died (killed for memory, crashed in an encoder): the next upload gets a new pool
+        _drop_pool(pool)
+        raise InvalidImage(f'image worker died ({e})') from e
+    except TimeoutError:
+        if not future.cancel():
+            # Still running: keep its source until it ends, then drop what it wrote
+            sink.pending = True
+            future.add_done_callback(lambda _: _discard(sink.name, args[1]))
+        raise
+
+
+def sniff(head):
+    """Image type named by the leading bytes `head`, or None."""
+    for kind, parts in MAGIC_BYTES:
+        if all(head[offset:offset + len(magic)] == magic for offset, magic in parts):
+            return kind
+    return None
+
+
+class UploadSink:
+    """Writable temporary file an image upload is streamed into, chunk by chunk.
+
+    Werkzeug's form parser writes the file part here as it reads the
+    request body. The content is hashed on the way; once its type or pixel
+    dimensions are known to be unacceptable, `error` is set and the rest of
+    the part is discarded. The file is deleted when the request closes it.
+    """
+
+    def __init__(self, folder, max_pixels):
+        self.file = tempfile.NamedTemporaryFile(dir=folder, prefix='.', suffix='.upload', delete=False)
+        self.name = self.file.name
+        self.max_pixels = max_pixels
+        self.digest = hashlib.sha256()
+        self.head = b''
+        self.kind = None
+        self.size = None
+        self.error = None
+        # Set while a render that timed out still reads the file
+        self.pending = False
+
+    def write(self, data):
+        if self.error is None:
+            if self.size is None and len(self.head) < HEADER_BYTES:
+                self.head += data[:HEADER_BYTES - len(self.head)]
+                self._check(complete=False)
+            if self.error is None:
+                self.digest.update(data)
+                self.file.write(data)
+        return len(data)
+
+    def _check(self, complete):
+        if self.kind is None and (complete or len(self.head) >= SNIFF_BYTES):
+            self.kind = sniff(self.head)
+            if self.kind is None:
+                return self._reject('not a JPEG, PNG, GIF, WebP or AVIF image')
+        if self.kind is not None and self.size is None:
+            # Reads the header only; nothing is decoded
+            try:
+                with Image.open(self.name if complete else io.BytesIO(self.head)) as image:
+                    self.size = image.size
+            except Image.DecompressionBombError as e:
+                return self._reject(str(e))
+            except Exception as e:
+                if complete:
+                    return self._reject(f'unreadable image header ({e})')
+                return None  # header not complete yet
+            width, height = self.size
+            if width * height > self.max_pixels:
+                self._reject(f'{width}x{height} exceeds {self.max_pixels} pixels')
+
+    def _reject(self, reason):
+        self.error = reason
+        self.file.truncate(0)
+
+    def finish(self):
+        """Run the checks left for the end of the upload; raises InvalidImage if it is rejected."""
+        self.file.flush()
+        if self.error is None:
+            self._check(complete=True)
+        if self.error is not None:
+            raise InvalidImage(self.error)
+
+    def __getattr__(self, name):
+        # read(), seek()... for Werkzeug and FileStorage
+        return getattr(self.file, name)
+
+    def close(self):
+        self.file.close()
+        if self.pending:
+            return
+        try:
+            os.remove(self.name)
+        except FileNotFoundError:
+            pass
+
+
+def temp_folder():
+    """Where uploads are received and rendered: UPLOAD_TEMP_FOLDER, or the system's."""
+    return current_app.config['UPLOAD_TEMP_FOLDER'] or tempfile.gettempdir()
+
+
+class UploadRequest(Request):
+    """Streams the file parts of @image_upload views into an UploadSink."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        view = current_app.view_functions.get(self.endpoint)
+        if filename and getattr(view, 'streams_image_upload', False):
+            return UploadSink(temp_folder(), current_app.config['IMAGE_MAX_PIXELS'])
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+def image_upload(view):
+    """Mark a view whose uploaded files are images, to be streamed through UploadSink."""
+    view.streams_image_upload = True
+    return view
+
+
+def upload_key(content_digest, widths, formats, quality):
+    """Name stem for the variants of an upload with this SHA-256 rendered with these settings."""
+    digest = hashlib.sha256(repr((tuple(widths), tuple(formats), quality)).encode())
+    digest.update(content_digest)
+    return digest.hexdigest()[:32]
+
+
+def _stored(stem):
+    """(image_url, image_variants) of a menu item already using these variants, or None."""
+    item = (MenuItem.query.filter(MenuItem.image_variants.contains(f'uploads/{stem}-'))
+            .with_entities(MenuItem.image_url, MenuItem.image_variants).first())
+    if item is None:
+        return None
+    folder = current_app.config['UPLOAD_FOLDER']
+    files = [os.path.join(folder, os.path.basename(path))
+             for sizes in json.loads(item.image_variants).values() for _, path in sizes]
+    # Files removed by hand are simply rendered again
+    if not all(os.path.exists(name) for name in files):
+        return None
+    # Fresh mtimes keep them out of collect_garbage() until the new item is saved
+    for name in files:
+        os.utime(name)
+    return item.image_url, item.image_variants
+
+
+def process_upload(file):
+    """Store the variants of an uploaded file; returns (image_url, image_variants JSON).
+
+    Decoding and encoding run in the IMAGE_WORKERS process pool (inline when
+    it is 0), so a large photo neither holds this worker's GIL nor grows its
+    memory. They are written to a private directory under temp_folder() and
+    moved to UPLOAD_FOLDER only once all of them are complete. The request
+    still waits for them, up to IMAGE_PROCESS_TIMEOUT: the admin form
+    re-renders the item card with its variants and flashes a rejected photo,
+    and nothing would finish attaching the image if this process stopped
+    after the item was saved. A photo already stored with the same settings
+    is reused as is. Raises InvalidImage if the upload is rejected, cannot be
+    decoded or kills its worker, TimeoutError if it takes too long.
+    """
+    config = current_app.config
+    folder = config['UPLOAD_FOLDER']
+    formats = available_formats(config['IMAGE_FORMATS'])
+    sink = file.stream
+    if not isinstance(sink, UploadSink):
+        # Not parsed by an @image_upload view: run it through the same checks
+        sink = UploadSink(temp_folder(), config['IMAGE_MAX_PIXELS'])
+        shutil.copyfileobj(file.stream, sink, CHUNK_SIZE)
+    work = None
+    try:
+        sink.finish()
+        stem = upload_key(sink.digest.digest(), config['IMAGE_WIDTHS'], formats, config['IMAGE_QUALITY'])
+        stored = _stored(stem)
+        if stored:
+            return stored
+        # Rendered privately, then published once every variant is written
+        work = tempfile.mkdtemp(dir=temp_folder(), prefix='.render-')
+        args = (sink.name, work, stem, config['IMAGE_WIDTHS'], formats, config['IMAGE_QUALITY'])
+        if config['IMAGE_WORKERS']:
+            variants = _render_in_pool(sink, args, config['IMAGE_WORKERS'], config['IMAGE_PROCESS_TIMEOUT'])
+        else:
+            variants = render_variants(*args)
+        for sizes in variants.values():
+            for _, name in sizes:
+                shutil.move(os.path.join(work, name), os.path.join(folder, name))
+    finally:
+        if sink is not file.stream:
+            sink.close()
+        if work is not None and not sink.pending:
+            shutil.rmtree(work, ignore_errors=True)
+
+    # Prefixed with the upload folder's path under static/
+    variants = {fmt: [[width, f'uploads/{name}'] for width, name in sizes] for fmt, sizes in variants.items()}
+    # Plain <img src>: the widest variant of the last (most widely supported) format
+    fallback = variants[formats[-1]][-1][1]
+    return url_for('static', filename=fallback), json.dumps(variants)
+
+
+def referenced_files():
+    """Names of the files in the upload folder that menu items point to."""
+    names = set()
+    for image_url, image_variants in MenuItem.query.with_entities(MenuItem.image_url, MenuItem.image_variants):
+        if image_url and '/uploads/' in image_url:
+            names.add(image_url.rsplit('/', 1)[1])
+        if image_variants:
+            names.update(os.path.basename(path) for sizes in json.loads(image_variants).values() for _, path in sizes)
+    return names
+
+
+def collect_garbage(grace_seconds, dry_run=False):
+    """Delete uploads no menu item references; returns the names removed.
+
+    Files modified in the last `grace_seconds` are kept: they may belong to
+    an upload whose menu item is not committed yet.
+    """
+    folder = current_app.config['UPLOAD_FOLDER']
+    keep = referenced_files()
+    cutoff = time.time() - grace_seconds
+    removed = []
+    for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+        if not entry.is_file() or entry.name in keep or entry.name in KEEP_FILES:
+            continue
+        if entry.stat().st_mtime > cutoff:
+            continue
+        if not dry_run:
+            os.remove(entry.path)
+        removed.append(entry.name)
+    return removed
+
+
+def _cache_uploads(response):
+    # Hashed upload names never change content: cache them for good
+    if (request.endpoint == 'static' and response.status_code in (200, 304)
+            and HASHED_NAME.match(request.view_args.get('filename', '').removeprefix('uploads/'))):
+        response.cache_control.public = True
+        response.cache_control.max_age = 365 * 24 * 3600
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
+
+
+def _srcset(sizes):
+    return ', '.join(f"{url_for('static', filename=path)} {width}w" for width, path in sizes)
+
+
+def image_sources(item):
+    """[(MIME type, srcset)] for each variant format of a menu item's image, best first, or [].
+
+    The last one is the format of `image_url`, for the <img> itself; the
+    others go in <source> elements.
+    """
+    if not item.image_variants:
+        return []
+    return [(f'image/{fmt}', _srcset(sizes)) for fmt, sizes in json.loads(item.image_variants).items()]
+
+
+def image_srcset(item, fmt=None):
+    """`srcset` value listing the `fmt` variants (default: those of `image_url`) of a menu item's image, or ''."""
+    if not item.image_variants:
+        return ''
+    variants = json.loads(item.image_variants)
+    if fmt is None:
+        fmt = next(reversed(variants), None)
+    return _srcset(variants.get(fmt, []))
+
+
+def init_app(app):
+    app.request_class = UploadRequest
+    app.add_template_global(image_srcset)
+    app.add_template_global(image_sources)
+    app.after_request(_cache_uploads)
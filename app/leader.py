@@ -0,0 +1,240 @@
+"""Run the scheduled jobs in exactly one process.
+
+Every worker (gunicorn, flask run) starts a small elector thread. The worker
+that takes the lock starts APScheduler; the others only retry the lock every
+third of SCHEDULER_LEASE_SECONDS. When the leader dies its lock goes with it
+(file lock and PostgreSQL session lock are released by the OS / server, a
+lease row expires) and another worker takes over.
+
+The elector must start after the worker fork, so do not combine it with
+gunicorn --preload.
+"""
+import atexit
+import hashlib
+import os
+import socket
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timedelta
+import click
+from flask.helpers import get_debug_flag
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from werkzeug.serving import is_running_from_reloader
+from . import db
+from .models import SchedulerLease
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+LEASE_NAME = 'scheduler'
+# Key of the PostgreSQL session advisory lock held by the leader
+ADVISORY_LOCK_KEY = 0x4C41_5343
+
+
+class FileLock:
+    """flock() on a local file: one leader per host, released when the process exits."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        handle = open(self.path, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._file = handle
+        return True
+
+    def renew(self):
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class AdvisoryLock:
+    """PostgreSQL session advisory lock, held on a dedicated connection."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._connection = None
+
+    def acquire(self):
+        connection = self.engine.connect()
+        try:
+            held = connection.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': ADVISORY_LOCK_KEY}).scalar()
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+        if not held:
+            connection.close()
+            return False
+        self._connection = connection
+        return True
+
+    def renew(self):
+        # The lock lives as long as its connection: check it is still there
+        try:
+            self._connection.execute(text('SELECT 1'))
+            self._connection.commit()
+            return True
+        except Exception:
+            self._close()
+            return False
+
+    def release(self):
+        if self._connection is not None:
+            try:
+                self._connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': ADVISORY_LOCK_KEY})
+                self._connection.commit()
+            except Exception:
+                pass
+            self._close()
+
+    def _close(self):
+        try:
+            self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+
+
+class LeaseLock:
+    """Lock row in scheduler_leases, valid until `expires_at` unless renewed."""
+
+    def __init__(self, owner, lease_seconds, name=LEASE_NAME):
+        self.owner = owner
+        self.lease = timedelta(seconds=lease_seconds)
+        self.name = name
+
+    def acquire(self):
+        """Take the lease if it is free or expired, or extend it if we hold it."""
+        now = datetime.utcnow()
+        try:
+            taken = SchedulerLease.query.filter(
+                SchedulerLease.name == self.name,
+                (SchedulerLease.owner == self.owner) | (SchedulerLease.expires_at < now),
+            ).update({'owner': self.owner, 'expires_at': now + self.lease}, synchronize_session=False)
+            if not taken:
+                db.session.add(SchedulerLease(name=self.name, owner=self.owner, expires_at=now + self.lease))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            # Row exists and belongs to a live leader
+            db.session.rollback()
+            return False
+        finally:
+            db.session.remove()
+
+    renew = acquire
+
+    def release(self):
+        try:
+            SchedulerLease.query.filter_by(name=self.name, owner=self.owner).delete(synchronize_session=False)
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+
+def make_lock(app, owner):
+    """Build the lock configured by SCHEDULER_LOCK, or None for 'none'."""
+    kind = app.config.get('SCHEDULER_LOCK', 'auto')
+    if kind == 'none':
+        return None
+    if kind == 'file' and fcntl is not None:
+        path = app.config.get('SCHEDULER_LOCK_FILE') or os.path.join(
+            tempfile.gettempdir(),
+            'lelagon-scheduler-%s.lock' % hashlib.sha1(app.config['SQLALCHEMY_DATABASE_URI'].encode()).hexdigest()[:12],
+        )
+        return FileLock(path)
+    with app.app_context():
+        if db.engine.dialect.name == 'postgresql':
+            return AdvisoryLock(db.engine)
+    return LeaseLock(owner, app.config['SCHEDULER_LEASE_SECONDS'])
+
+
+class SchedulerLeader:
+    """Starts the scheduler while this process holds the lock, pauses it otherwise."""
+
+    def __init__(self, app, scheduler, lock):
+        self.app = app
+        self.scheduler = scheduler
+        self.lock = lock
+        self.leading = False
+        self.interval = app.config['SCHEDULER_LEASE_SECONDS'] / 3
+        self._stop = threading.Event()
+        self._thread = None
+
+    def step(self):
+        """Acquire or renew the lock once and promote/demote the scheduler to match."""
+        with self.app.app_context():
+            try:
+                held = self.lock.renew() if self.leading else self.lock.acquire()
+            except Exception as e:
+                print(f"Scheduler election failed: {e}")
+                held = False
+        if held and not self.leading:
+            if self.scheduler.running:
+                self.scheduler.resume()
+            else:
+                self.scheduler.start()
+        elif self.leading and not held and self.scheduler.running:
+            self.scheduler.pause()
+        self.leading = held
+        return held
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='scheduler-leader', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self.step()
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.leading:
+            if self.scheduler.running:
+                self.scheduler.pause()
+            with self.app.app_context():
+                self.lock.release()
+            self.leading = False
+
+
+def running_cli_command():
+    """True when the app was loaded for a `flask` command other than `flask run`."""
+    ctx = click.get_current_context(silent=True)
+    return ctx is not None and ctx.info_name != 'run'
+
+
+def start_scheduler(app, scheduler):
+    """Start the scheduler in this process, behind leader election unless disabled."""
+    # The debug reloader's parent process never serves nor runs jobs
+    if get_debug_flag() and not is_running_from_reloader():
+        return None
+    owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+    lock = make_lock(app, owner)
+    if lock is None:
+        scheduler.start()
+        return None
+    leader = SchedulerLeader(app, scheduler, lock)
+    leader.start()
+    # Hand over right away on a clean shutdown instead of waiting for the lease
+    atexit.register(leader.stop)
+    app.extensions['scheduler_leader'] = leader
+    return leader
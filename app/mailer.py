@@ -0,0 +1,99 @@
+"""Bulk email delivery over a bounded pool of persistent SMTP connections."""
+import queue
+import smtplib
+import threading
+import time
+from flask import current_app
+from . import mail
+
+
+class DeliveryReport:
+    """Outcome of a send_bulk() run: keys sent, keys failed (with error) and timing."""
+
+    def __init__(self):
+        self.sent = []
+        self.failed = {}
+        self.connections = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def _record(self, key, error=None):
+        with self._lock:
+            if error is None:
+                self.sent.append(key)
+            else:
+                self.failed[key] = str(error)
+
+    def merge(self, other):
+        self.sent.extend(other.sent)
+        self.failed.update(other.failed)
+        self.connections += other.connections
+        self.elapsed += other.elapsed
+
+    def summary(self):
+        return (f"{len(self.sent)} sent, {len(self.failed)} failed in {self.elapsed:.2f}s "
+                f"over {self.connections} connection(s)")
+
+
+def send_bulk(messages, connections=None):
+    """Send (key, Message) pairs over up to `connections` parallel SMTP connections.
+
+    Each worker opens one connection and reuses it for every message it
+    takes from the shared queue (Flask-Mail's MAIL_MAX_EMAILS still caps
+    messages per session). A message refused by the server is recorded
+    as failed and the connection kept; a broken connection is reopened
+    for the next message.
+    """
+    report = DeliveryReport()
+    pending = queue.Queue()
+    for item in messages:
+        pending.put(item)
+    if pending.empty():
+        return report
+
+    app = current_app._get_current_object()
+    workers = min(connections or app.config['MAIL_POOL_SIZE'], pending.qsize())
+
+    def worker():
+        with app.app_context():
+            connection = None
+            try:
+                while True:
+                    try:
+                        key, msg = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        if connection is None:
+                            connection = mail.connect()
+                            connection.__enter__()
+                            with report._lock:
+                                report.connections += 1
+                        connection.send(msg)
+                    except smtplib.SMTPResponseException as e:
+                        report._record(key, e)
+                    except Exception as e:
+                        report._record(key, e)
+                        connection = _close(connection)
+                    else:
+                        report._record(key)
+            finally:
+                _close(connection)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def _close(connection):
+    if connection is not None:
+        try:
+            connection.__exit__(None, None, None)
+        except Exception:
+            pass
+    return None
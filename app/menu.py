@@ -0,0 +1,202 @@
+"""Public menu helpers: version stamp and rendered fragment cache."""
+import re
+import unicodedata
+import uuid
+from flask import current_app, g, has_request_context, render_template, request
+from . import cache, db
+from .compression import compress_variants, precompressed_response
+from .models import MenuItem, Category, Settings
+
+# Settings row holding a token that changes on every admin menu mutation.
+# Every worker reads it once per request, so all see a bump on their next
+# one. It is one of Settings.UNVERSIONED_KEYS: a menu edit leaves the
+# cached settings and the settings-derived ETags alone.
+MENU_VERSION_KEY = 'MENU_VERSION'
+
+
+def _menu_stamp():
+    # (version, updated_at), read once per request; every time outside of one
+    scope = request._get_current_object() if has_request_context() else None
+    cached = g.get('_menu_stamp')
+    if scope is None or cached is None or cached[0] is not scope:
+        row = db.session.query(Settings.value, Settings.updated_at).filter_by(key=MENU_VERSION_KEY).first()
+        cached = g._menu_stamp = (scope, tuple(row) if row else ('0', None))
+    return cached[1]
+
+
+def menu_version():
+    return _menu_stamp()[0]
+
+
+def menu_last_modified():
+    """When the menu was last edited, or None."""
+    return _menu_stamp()[1]
+
+
+def bump_menu_version():
+    """Invalidate every cached menu fragment. Call after committing a menu change."""
+    row = Settings.query.filter_by(key=MENU_VERSION_KEY).first()
+    if row is None:
+        row = Settings(key=MENU_VERSION_KEY)
+        db.session.add(row)
+    row.value = uuid.uuid4().hex
+    db.session.commit()
+    g.pop('_menu_stamp', None)
+
+
+def normalize(text):
+    """Lowercase and strip accents, so 'Tiébou Dieune' and 'tiebou dieune' compare equal."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text):
+    return re.findall(r'[a-z0-9]+', normalize(text))
+
+
+def trigrams(token):
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Inverted index over the normalised name, tags, allergens and description of menu entries.
+
+    Query words match indexed words by prefix ('yas' finds 'yassa'). Words
+    with no prefix match fall back to trigram similarity, which absorbs
+    spelling variants such as 'thiebou' for 'tiébou'. Results are ranked by
+    where the words matched (name first), then by menu order.
+    """
+
+    # Field weights: a hit in the dish name outranks one in its description
+    WEIGHTS = (('name', 3), ('dietary_tags', 2), ('allergens', 2), ('description', 1))
+    MIN_SIMILARITY = 0.45
+
+    def __init__(self, entries):
+        self.entries = tuple(entries)
+        self.prefixes = {}   # prefix -> {entry position: weight}
+        self.words = {}      # word -> {entry position: weight}
+        for pos, entry in enumerate(self.entries):
+            for field, weight in self.WEIGHTS:
+                for word in tokenize(getattr(entry, field)):
+                    postings = self.words.setdefault(word, {})
+                    postings[pos] = max(postings.get(pos, 0), weight)
+        for word, postings in self.words.items():
+            for end in range(1, len(word) + 1):
+                merged = self.prefixes.setdefault(word[:end], {})
+                for pos, weight in postings.items():
+                    merged[pos] = max(merged.get(pos, 0), weight)
+        self.trigram_words = {}
+        for word in self.words:
+            for gram in trigrams(word):
+                self.trigram_words.setdefault(gram, set()).add(word)
+
+    def _fuzzy(self, term):
+        grams = trigrams(term)
+        candidates = set()
+        for gram in grams:
+            candidates |= self.trigram_words.get(gram, set())
+        matches = {}
+        for word in candidates:
+            other = trigrams(word)
+            similarity = len(grams & other) / len(grams | other)
+            if similarity >= self.MIN_SIMILARITY:
+                for pos, weight in self.words[word].items():
+                    matches[pos] = max(matches.get(pos, 0), weight * similarity)
+        return matches
+
+    def search(self, query):
+        """Return the entries matching every word of `query`, best first."""
+        scores = None
+        for term in tokenize(query):
+            matches = self.prefixes.get(term) or self._fuzzy(term)
+            if scores is None:
+                scores = dict(matches)
+            else:
+                scores = {pos: score + matches[pos] for pos, score in scores.items() if pos in matches}
+            if not scores:
+                return []
+        if scores is None:
+            return list(self.entries)
+        return [self.entries[pos] for pos in sorted(scores, key=lambda pos: (-scores[pos], pos))]
+
+
+class MenuEntry:
+    """Immutable, template-compatible copy of an available MenuItem."""
+    __slots__ = ('id', 'name', 'description', 'price', 'image_url', 'image_variants', 'allergens', 'dietary_tags',
+                 'is_special', 'category_slug', 'tags')
+
+    def __init__(self, item, category_slug):
+        for attr in ('id', 'name', 'description', 'price', 'image_url', 'image_variants', 'allergens', 'dietary_tags',
+                     'is_special'):
+            object.__setattr__(self, attr, getattr(item, attr))
+        object.__setattr__(self, 'category_slug', category_slug)
+        object.__setattr__(self, 'tags', frozenset(
+            t.strip().lower() for t in (item.dietary_tags or '').split(',') if t.strip()
+        ))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('MenuEntry is read-only')
+
+
+class MenuSnapshot:
+    """The available menu for one menu version, held in process memory.
+
+    The whole public menu is a few dozen items, so filtering a prebuilt,
+    display-ordered tuple beats a database round trip on every request.
+    """
+
+    def __init__(self, version, entries):
+        self.version = version
+        self.items = tuple(entries)
+        by_category = {}
+        for entry in self.items:
+            by_category.setdefault(entry.category_slug, []).append(entry)
+        self.by_category = {slug: tuple(entries) for slug, entries in by_category.items()}
+        self.index = SearchIndex(self.items)
+
+    @classmethod
+    def load(cls, version):
+        rows = (db.session.query(MenuItem, Category.slug)
+                .outerjoin(Category, MenuItem.category_id == Category.id)
+                .filter(MenuItem.is_available.is_(True))
+                .order_by(MenuItem.order))
+        return cls(version, (MenuEntry(item, slug) for item, slug in rows))
+
+    def filter(self, category_slug='all', search_query='', vegetarian=False):
+        if search_query:
+            items = self.index.search(search_query)
+            if category_slug != 'all':
+                items = [e for e in items if e.category_slug == category_slug]
+        else:
+            items = self.items if category_slug == 'all' else self.by_category.get(category_slug, ())
+        if vegetarian:
+            items = [e for e in items if 'vegetarian' in e.tags]
+        return list(items)
+
+
+def menu_snapshot():
+    """Return the current MenuSnapshot, rebuilding it when the menu version moved."""
+    version = menu_version()
+    snapshot = current_app.extensions.get('menu_snapshot')
+    if snapshot is None or snapshot.version != version:
+        snapshot = MenuSnapshot.load(version)
+        current_app.extensions['menu_snapshot'] = snapshot
+    return snapshot
+
+
+def render_menu_items(category_slug, search_query, is_vegetarian):
+    """Response with components/menu_items.html for a filter, cached per menu version.
+
+    The fragment is cached along with its compressed copies, so a cache hit
+    costs neither rendering nor compression.
+    """
+    snapshot = menu_snapshot()
+    search_query = ' '.join(tokenize(search_query))
+    key = f'menu_items:{snapshot.version}:{category_slug}:{int(is_vegetarian)}:{search_query}'
+    variants = cache.get(key)
+    if variants is None:
+        items = snapshot.filter(category_slug, search_query, is_vegetarian)
+        variants = compress_variants(render_template('components/menu_items.html', items=items))
+        cache.set(key, variants)
+    return precompressed_response(variants)
@@ -1,4 +1,7 @@
+import json
+import uuid
 from . import db, login_manager
+from flask import current_app, g, has_request_context, request
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from datetime import datetime
@@ -43,6 +46,8 @@ class MenuItem(db.Model):
     description = db.Column(db.Text)
     price = db.Column(db.Numeric(10, 2), nullable=False)
     image_url = db.Column(db.String(255))
+    # Uploaded photos: {format: [[width, static path], ...]} as JSON, see app.images
+    image_variants = db.Column(db.Text)
     allergens = db.Column(db.String(255))
     dietary_tags = db.Column(db.String(100)) # e.g. "vegan,gluten-free"
     is_available = db.Column(db.Boolean, default=True)
@@ -50,6 +55,13 @@ class MenuItem(db.Model):
     order = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Public menu: available items, optionally per category, in display order
+        db.Index('ix_menu_items_available_category_order', 'is_available', 'category_id', 'order'),
+        # Admin menu: items of a category in display order
+        db.Index('ix_menu_items_category_order', 'category_id', 'order'),
+    )
+
 class Reservation(db.Model):
     __tablename__ = 'reservations'
     id = db.Column(db.Integer, primary_key=True)
@@ -65,6 +77,29 @@ class Reservation(db.Model):
     internal_notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
+    # Reminder state, see app.reminders: claimed while a run is sending it, sent once delivered
+    reminder_claimed_at = db.Column(db.DateTime)
+    reminder_sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Occupancy rebuilds and the dashboard: bookings of a date by status
+        db.Index('ix_reservations_date_status', 'date', 'status'),
+        # Admin list: status filter, newest sitting first
+        db.Index('ix_reservations_status_date_time', 'status', 'date', 'time'),
+        # Dashboard: latest bookings
+        db.Index('ix_reservations_created_at', 'created_at'),
+        # Incremental exports: bookings by last change (see app.exports.CHANGED_AT)
+        db.Index('ix_reservations_changed_at', db.func.coalesce(updated_at, created_at), id),
+    )
+
+class SlotOccupancy(db.Model):
+    """Covers seated per date and time bucket, maintained alongside reservations."""
+    __tablename__ = 'slot_occupancy'
+    date = db.Column(db.Date, primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True) # index of the BUCKET_MINUTES slice since midnight
+    covers = db.Column(db.Integer, nullable=False, default=0)
+
+_UNPARSEABLE = object()
 
 class Settings(db.Model):
     __tablename__ = 'settings'
@@ -73,25 +108,65 @@ class Settings(db.Model):
     value = db.Column(db.Text)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Row whose value changes on every write, so each worker can tell when
+    # its cached copy of the settings is stale.
+    VERSION_KEY = '_VERSION'
+    # Rows written and read on their own, outside the cache and version():
+    # the menu version (see app.menu) changes on every menu edit
+    UNVERSIONED_KEYS = ('MENU_VERSION',)
+    JSON_KEYS = ('OPENING_HOURS', 'CLOSED_DATES', 'NOTIFICATION_EMAILS')
+
+    @classmethod
+    def _cache(cls):
+        """Return this app's cached settings, revalidated once per request.
+
+        Values (and parsed JSON) are shared by every request of the worker and
+        must be treated as read-only.
+        """
+        cache = current_app.extensions.get('settings_cache')
+        # An app context can outlive a single request (tests, CLI), so the
+        # check is tied to the request object when there is one.
+        scope = request._get_current_object() if has_request_context() else True
+        if cache is None or g.get('_settings_validated') is not scope:
+            stamp = db.session.query(cls.value, cls.updated_at).filter_by(key=cls.VERSION_KEY).first()
+            version, updated_at = stamp or (None, None)
+            if cache is None or cache['version'] != version:
+                rows = db.session.query(cls.key, cls.value).filter(cls.key.notin_((cls.VERSION_KEY, *cls.UNVERSIONED_KEYS)))
+                cache = {'version': version, 'updated_at': updated_at, 'values': dict(rows.all()), 'parsed': {}}
+                current_app.extensions['settings_cache'] = cache
+            g._settings_validated = scope
+        return cache
+
+    @classmethod
+    def version(cls):
+        """Token that changes whenever any setting is written."""
+        return cls._cache()['version']
+
+    @classmethod
+    def last_modified(cls):
+        """When any setting was last written, or None."""
+        return cls._cache()['updated_at']
+
     @classmethod
     def get(cls, key, default=None, as_json=False):
-        s = cls.query.filter_by(key=key).first()
-        if not s:
+        cache = cls._cache()
+        if key not in cache['values']:
             return default
-        val = s.value
+        val = cache['values'][key]
         if as_json:
-            try:
-                import json
-                return json.loads(val or 'null')
-            except Exception:
-                return default
+            if key not in cache['parsed']:
+                try:
+                    cache['parsed'][key] = json.loads(val or 'null')
+                except Exception:
+                    cache['parsed'][key] = _UNPARSEABLE
+            parsed = cache['parsed'][key]
+            return default if parsed is _UNPARSEABLE else parsed
         return val
 
     @classmethod
     def set(cls, key, value, as_json=False):
         s = cls.query.filter_by(key=key).first()
         if as_json:
-            import json
             val = json.dumps(value)
         else:
             val = str(value) if value is not None else None
@@ -102,12 +177,77 @@ class Settings(db.Model):
         else:
             s.value = val
 
+        cls._bump_version()
         db.session.commit()
         return s
 
     @classmethod
-    def get_all(cls):
-        return {s.key: s.value for s in cls.query.all()}
+    def set_many(cls, values, json_keys=()):
+        """Write several settings (and the version stamp) in a single commit.
+
+        Keys listed in `json_keys` are stored JSON-encoded. SQLite and
+        PostgreSQL upsert every row in one INSERT ... ON CONFLICT statement;
+        other databases load the existing rows in one query and update them.
+        """
+        now = datetime.utcnow()
+        rows = {}
+        for key, value in values.items():
+            if key in json_keys:
+                rows[key] = json.dumps(value)
+            else:
+                rows[key] = str(value) if value is not None else None
+        rows[cls.VERSION_KEY] = uuid.uuid4().hex
+
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(cls).values([{'key': k, 'value': v, 'updated_at': now} for k, v in rows.items()])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[cls.key],
+                set_={'value': stmt.excluded.value, 'updated_at': stmt.excluded.updated_at},
+            )
+            db.session.execute(stmt)
+        else:
+            existing = {s.key: s for s in cls.query.filter(cls.key.in_(list(rows)))}
+            for key, val in rows.items():
+                if key in existing:
+                    existing[key].value = val
+                else:
+                    db.session.add(cls(key=key, value=val))
+
+        db.session.commit()
+        current_app.extensions.pop('settings_cache', None)
+
+    @classmethod
+    def _bump_version(cls):
+        stamp = cls.query.filter_by(key=cls.VERSION_KEY).first()
+        if not stamp:
+            stamp = cls(key=cls.VERSION_KEY)
+            db.session.add(stamp)
+        stamp.value = uuid.uuid4().hex
+        current_app.extensions.pop('settings_cache', None)
+
+    @classmethod
+    def get_all(cls, parse_json=False):
+        """Return every setting; with `parse_json`, JSON_KEYS are decoded (None if invalid)."""
+        cache = cls._cache()
+        if not parse_json:
+            return dict(cache['values'])
+        if 'all' not in cache:
+            parsed = {}
+            for k, v in cache['values'].items():
+                if k in cls.JSON_KEYS and v:
+                    try:
+                        parsed[k] = json.loads(v)
+                    except Exception:
+                        parsed[k] = None
+                else:
+                    parsed[k] = v
+            cache['all'] = parsed
+        return dict(cache['all'])
 
 class Testimonial(db.Model):
     __tablename__ = 'testimonials'
@@ -128,3 +268,47 @@ class ContactMessage(db.Model):
     ip = db.Column(db.String(45))
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class OutboundEmail(db.Model):
+    """Email waiting in the outbox, delivered by the deliver_outbox job."""
+    __tablename__ = 'outbound_emails'
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(255))
+    recipients = db.Column(db.Text, nullable=False) # comma-separated
+    body = db.Column(db.Text)
+    status = db.Column(db.String(20), default='pending') # pending, sent, failed
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    claimed_at = db.Column(db.DateTime) # set while a delivery pass is sending it
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Outbox polling: pending messages that are due
+        db.Index('ix_outbound_emails_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+
+class SchedulerLease(db.Model):
+    """Lock row naming the process that runs the scheduled jobs (see app.leader)."""
+    __tablename__ = 'scheduler_leases'
+    name = db.Column(db.String(50), primary_key=True)
+    owner = db.Column(db.String(120), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class DailyStats(db.Model):
+    """Per-day reservation totals, kept in step with reservations (see app.rollup)."""
+    __tablename__ = 'daily_stats'
+    date = db.Column(db.Date, primary_key=True)
+    reservations = db.Column(db.Integer, nullable=False, default=0) # every status
+    covers = db.Column(db.Integer, nullable=False, default=0) # guests of non-cancelled bookings
+    lunch_covers = db.Column(db.Integer, nullable=False, default=0)
+    dinner_covers = db.Column(db.Integer, nullable=False, default=0)
+    pending = db.Column(db.Integer, nullable=False, default=0)
+    confirmed = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    cancelled = db.Column(db.Integer, nullable=False, default=0)
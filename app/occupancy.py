@@ -0,0 +1,288 @@
+"""Seat occupancy per day, shared by the availability API and the booking flow."""
+import random
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from . import db
+from .models import Reservation, Settings, SlotOccupancy
+
+# Granularity of the occupancy grid. Bookings starting off-grid are rounded
+# outwards (start down, end up) so the grid never under-counts seated covers.
+BUCKET_MINUTES = 15
+# Two days of buckets so late dinners running past midnight still fit.
+DAY_BUCKETS = 2 * 24 * 60 // BUCKET_MINUTES
+# Namespace for the per-date PostgreSQL advisory locks taken by lock_day().
+ADVISORY_LOCK_CLASS = 0x4C41
+ADMISSION_ATTEMPTS = 5
+
+
+def bucket_span(start_time, duration_minutes):
+    """Return the [first, last) bucket range occupied by a booking at `start_time`."""
+    start = start_time.hour * 60 + start_time.minute
+    first = start // BUCKET_MINUTES
+    last = -(-(start + duration_minutes) // BUCKET_MINUTES)
+    return first, min(last, DAY_BUCKETS)
+
+
+def reservation_rules():
+    """Return (capacity, table duration in minutes) from settings, with config fallbacks."""
+    try:
+        capacity = int(Settings.get('CAPACITY', default=current_app.config.get('CAPACITY', 50)))
+    except Exception:
+        capacity = int(current_app.config.get('CAPACITY', 50))
+
+    try:
+        td_minutes = int(Settings.get('TABLE_DURATION_MINUTES', default=current_app.config.get('DEFAULT_TABLE_DURATION_MINUTES', 120)))
+    except Exception:
+        td_minutes = int(current_app.config.get('DEFAULT_TABLE_DURATION_MINUTES', 120))
+
+    return capacity, td_minutes
+
+
+def service_slots(start, end, step_minutes=30):
+    """List the 'HH:MM' slots between two 'HH:MM' bounds (inclusive)."""
+    slots = []
+    current_slot = datetime.strptime(start, '%H:%M')
+    end_slot = datetime.strptime(end, '%H:%M')
+    while current_slot <= end_slot:
+        slots.append(current_slot.strftime('%H:%M'))
+        current_slot += timedelta(minutes=step_minutes)
+    return slots
+
+
+class DayOccupancy:
+    """Covers seated per time bucket for a single date.
+
+    Bookings are accumulated in a difference array. The first query builds the
+    per-bucket totals and a sparse table over them, after which the peak
+    occupancy of any window is answered in O(1).
+    """
+
+    def __init__(self, duration_minutes):
+        self.duration = duration_minutes
+        self._diff = [0] * (DAY_BUCKETS + 1)
+        self._levels = None
+
+    @classmethod
+    def for_date(cls, day, duration_minutes):
+        """Load the occupancy of `day` from the materialised slot_occupancy rows."""
+        occupancy = cls(duration_minutes)
+        rows = SlotOccupancy.query.with_entities(SlotOccupancy.bucket, SlotOccupancy.covers).filter(
+            SlotOccupancy.date == day
+        )
+        for bucket, covers in rows:
+            occupancy._add_range(bucket, bucket + 1, covers)
+        return occupancy
+
+    @classmethod
+    def from_reservations(cls, day, duration_minutes):
+        """Recompute the occupancy of `day` from its non-cancelled reservations."""
+        occupancy = cls(duration_minutes)
+        rows = Reservation.query.with_entities(Reservation.time, Reservation.guests).filter(
+            Reservation.date == day, Reservation.status != 'cancelled'
+        )
+        for start_time, guests in rows:
+            occupancy.add(start_time, guests or 0)
+        return occupancy
+
+    def _add_range(self, first, last, guests):
+        self._diff[first] += guests
+        self._diff[last] -= guests
+        self._levels = None
+
+    def add(self, start_time, guests):
+        self._add_range(*bucket_span(start_time, self.duration), guests)
+
+    def remove(self, start_time, guests):
+        self.add(start_time, -guests)
+
+    @property
+    def covers(self):
+        """Covers seated in each bucket of the day."""
+        if self._levels is None:
+            self._build()
+        return self._levels[0]
+
+    def _build(self):
+        covers = []
+        running = 0
+        for delta in self._diff[:DAY_BUCKETS]:
+            running += delta
+            covers.append(running)
+
+        levels = [covers]
+        width = 1
+        while width * 2 <= DAY_BUCKETS:
+            prev = levels[-1]
+            levels.append([max(prev[i], prev[i + width]) for i in range(len(prev) - width)])
+            width *= 2
+        self._levels = levels
+
+    def peak(self, start_time, duration_minutes=None):
+        """Maximum concurrent covers in [start_time, start_time + duration)."""
+        first, last = bucket_span(start_time, duration_minutes or self.duration)
+        if last <= first:
+            return 0
+        if self._levels is None:
+            self._build()
+        k = (last - first).bit_length() - 1
+        level = self._levels[k]
+        return max(level[first], level[last - (1 << k)])
+
+    def fits(self, start_time, guests, capacity):
+        """True if `guests` more covers can sit at `start_time` without exceeding capacity."""
+        return self.peak(start_time) + guests <= capacity
+
+
+def snapshot(reservation):
+    """Return what a reservation contributes to occupancy, or None if it seats nobody."""
+    if reservation.status == 'cancelled' or not reservation.guests:
+        return None
+    return reservation.date, reservation.time, reservation.guests
+
+
+def lock_day(day):
+    """Serialise occupancy writes for `day` until the current transaction ends.
+
+    PostgreSQL takes a transaction-scoped advisory lock per date. SQLite only
+    has a database-wide write lock, taken up front with BEGIN IMMEDIATE so the
+    capacity check that follows reads committed data no other writer can change.
+    Other backends fall back to row locks on the date's occupancy rows.
+    """
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        connection.execute(text('SELECT pg_advisory_xact_lock(:cls, :day)'),
+                           {'cls': ADVISORY_LOCK_CLASS, 'day': day.toordinal()})
+    elif dialect == 'sqlite':
+        # Already inside a write transaction (e.g. a flushed UPDATE): the
+        # write lock is held until commit.
+        if not connection.connection.driver_connection.in_transaction:
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+    else:
+        SlotOccupancy.query.filter(SlotOccupancy.date == day).with_for_update().all()
+
+
+def _shift(day, start_time, guests, duration_minutes):
+    """Add `guests` (negative to remove) to the stored buckets of a booking.
+
+    Returns False, changing nothing, if that would leave negative covers:
+    the rows did not account for the booking in the first place.
+    """
+    first, last = bucket_span(start_time, duration_minutes)
+    rows = {row.bucket: row for row in SlotOccupancy.query.filter(
+        SlotOccupancy.date == day, SlotOccupancy.bucket >= first, SlotOccupancy.bucket < last
+    )}
+    if any((rows[bucket].covers if bucket in rows else 0) + guests < 0 for bucket in range(first, last)):
+        return False
+    for bucket in range(first, last):
+        row = rows.get(bucket)
+        if row is None:
+            db.session.add(SlotOccupancy(date=day, bucket=bucket, covers=guests))
+        elif row.covers + guests:
+            row.covers += guests
+        else:
+            db.session.delete(row)
+    return True
+
+
+def _reset_day(day, duration_minutes):
+    # Recompute the day from its reservations, pending changes included (autoflush)
+    for row in SlotOccupancy.query.filter(SlotOccupancy.date == day):
+        db.session.delete(row)
+    db.session.flush()
+    covers = DayOccupancy.from_reservations(day, duration_minutes).covers
+    db.session.add_all(SlotOccupancy(date=day, bucket=bucket, covers=c) for bucket, c in enumerate(covers) if c)
+
+
+def track_change(before, reservation):
+    """Update slot_occupancy for a reservation whose contribution was `before`.
+
+    Call after mutating the reservation and before committing, so the
+    reservation and its occupancy change land in the same transaction.
+    A day whose rows turn out not to match its reservations is rebuilt.
+    """
+    after = snapshot(reservation)
+    if before == after:
+        return
+    _, td_minutes = reservation_rules()
+    for day in sorted({state[0] for state in (before, after) if state}):
+        lock_day(day)
+    rebuilt = set()
+    for state, sign in ((before, -1), (after, 1)):
+        if not state or state[0] in rebuilt:
+            continue
+        day, start_time, guests = state
+        if not _shift(day, start_time, sign * guests, td_minutes):
+            current_app.logger.warning("Occupancy of %s did not match its reservations: rebuilding it", day)
+            _reset_day(day, td_minutes)
+            rebuilt.add(day)
+
+
+def admit(reservation, *related):
+    """Insert and commit `reservation` if the slot still has room for it.
+
+    The capacity check and the insert run under lock_day(), so concurrent
+    bookings for the same date cannot both pass the check and overbook.
+    `related` rows (e.g. its confirmation email) are inserted in the same
+    transaction. Lock timeouts are retried with jittered exponential
+    backoff. Returns False, with nothing written, when the slot is full.
+    """
+    capacity, td_minutes = reservation_rules()
+    for attempt in range(ADMISSION_ATTEMPTS):
+        try:
+            lock_day(reservation.date)
+            if not DayOccupancy.for_date(reservation.date, td_minutes).fits(reservation.time, reservation.guests, capacity):
+                db.session.rollback()
+                return False
+            db.session.add(reservation)
+            db.session.add_all(related)
+            track_change(None, reservation)
+            db.session.commit()
+            return True
+        except OperationalError:
+            db.session.rollback()
+            if attempt == ADMISSION_ATTEMPTS - 1:
+                raise
+            time.sleep(0.05 * 2 ** attempt * (1 + random.random()))
+
+
+def rebuild(day=None, since=None):
+    """Regenerate slot_occupancy from reservations.
+
+    Restricted to a single `day`, or to dates on or after `since`, when given.
+    Returns the dates whose stored occupancy did not match the reservations.
+    """
+    _, td_minutes = reservation_rules()
+
+    def scoped(query, column):
+        if day is not None:
+            return query.filter(column == day)
+        if since is not None:
+            return query.filter(column >= since)
+        return query
+
+    stored = {}
+    rows = SlotOccupancy.query.with_entities(SlotOccupancy.date, SlotOccupancy.bucket, SlotOccupancy.covers)
+    for d, bucket, covers in scoped(rows, SlotOccupancy.date):
+        stored.setdefault(d, {})[bucket] = covers
+
+    dates = scoped(Reservation.query.with_entities(Reservation.date).distinct(), Reservation.date)
+    expected = {}
+    for (d,) in dates:
+        covers = DayOccupancy.from_reservations(d, td_minutes).covers
+        buckets = {bucket: c for bucket, c in enumerate(covers) if c}
+        if buckets:
+            expected[d] = buckets
+
+    mismatched = sorted(d for d in set(stored) | set(expected) if stored.get(d) != expected.get(d))
+
+    scoped(SlotOccupancy.query, SlotOccupancy.date).delete(synchronize_session=False)
+    db.session.add_all(
+        SlotOccupancy(date=d, bucket=bucket, covers=c)
+        for d, buckets in expected.items() for bucket, c in buckets.items()
+    )
+    db.session.commit()
+    return mismatched
@@ -0,0 +1,132 @@
+"""Durable outbound email queue.
+
+Request handlers call enqueue_email() and return immediately; the
+deliver_outbox scheduler job sends due messages over one SMTP connection
+and reschedules failures with exponential backoff. A message that must
+exist if and only if another write does (a booking's confirmation) is
+built with compose_email() and committed with that write.
+
+Each pass claims its messages first (claimed_at), so a manual
+`flask deliver-outbox` and the scheduler never send the same message;
+claims left by a crashed pass expire after OUTBOX_CLAIM_SECONDS.
+"""
+import smtplib
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import or_, update
+from . import db, mail
+from .models import OutboundEmail
+
+
+def default_sender():
+    return current_app.config['MAIL_USERNAME'] or 'Le Lagon <noreply@lelagon.com>'
+
+
+def compose_email(subject, recipients, body, sender=None):
+    """Outbox row for an email, to be added and committed by the caller."""
+    return OutboundEmail(
+        subject=subject,
+        sender=sender or default_sender(),
+        recipients=','.join(r for r in recipients if r),
+        body=body,
+    )
+
+
+def enqueue_email(subject, recipients, body, sender=None):
+    """Queue an email for background delivery and commit it."""
+    email = compose_email(subject, recipients, body, sender)
+    db.session.add(email)
+    db.session.commit()
+    return email
+
+
+def _claim(now, limit):
+    """Claim up to `limit` due messages; returns them, oldest due first."""
+    stale_before = now - timedelta(seconds=current_app.config['OUTBOX_CLAIM_SECONDS'])
+    due = (
+        OutboundEmail.status == 'pending',
+        OutboundEmail.next_attempt_at <= now,
+        or_(OutboundEmail.claimed_at.is_(None), OutboundEmail.claimed_at < stale_before),
+    )
+    ids = [eid for (eid,) in OutboundEmail.query.with_entities(OutboundEmail.id).filter(*due)
+           .order_by(OutboundEmail.next_attempt_at, OutboundEmail.id).limit(limit)]
+    if not ids:
+        return []
+    claimed_at = datetime.utcnow()
+    db.session.execute(
+        update(OutboundEmail)
+        .where(OutboundEmail.id.in_(ids), *due)
+        .values(claimed_at=claimed_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return (OutboundEmail.query.filter(OutboundEmail.id.in_(ids), OutboundEmail.claimed_at == claimed_at)
+            .order_by(OutboundEmail.next_attempt_at, OutboundEmail.id).all())
+
+
+def _record_failure(email, error, now):
+    email.claimed_at = None
+    email.attempts = (email.attempts or 0) + 1
+    email.last_error = str(error)[:1000]
+    if email.attempts >= current_app.config['OUTBOX_MAX_ATTEMPTS']:
+        email.status = 'failed'
+    else:
+        delay = current_app.config['OUTBOX_RETRY_BASE_SECONDS'] * 2 ** (email.attempts - 1)
+        email.next_attempt_at = now + timedelta(seconds=delay)
+
+
+def _connection_lost(error):
+    # smtplib errors are OSErrors too: only a disconnect or a socket error
+    # without an SMTP reply means the connection is gone
+    return isinstance(error, smtplib.SMTPServerDisconnected) or (
+        isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException))
+
+
+def deliver_pending(limit=None):
+    """Send due outbox messages. Returns (sent, failed) counts for this pass."""
+    now = datetime.utcnow()
+    due = _claim(now, limit or current_app.config['OUTBOX_BATCH_SIZE'])
+    if not due:
+        return 0, 0
+
+    sent = failed = 0
+    remaining = list(due)
+    connected = False
+    try:
+        with mail.connect() as connection:
+            connected = True
+            while remaining:
+                email = remaining[0]
+                msg = Message(subject=email.subject, sender=email.sender,
+                              recipients=email.recipients.split(','), body=email.body)
+                try:
+                    connection.send(msg)
+                except Exception as e:
+                    if _connection_lost(e):
+                        raise
+                    # Refused by the server: this message's own attempt
+                    _record_failure(email, e, now)
+                    failed += 1
+                else:
+                    email.status = 'sent'
+                    email.claimed_at = None
+                    email.sent_at = datetime.utcnow()
+                    email.attempts = (email.attempts or 0) + 1
+                    sent += 1
+                remaining.pop(0)
+                db.session.commit()
+    except Exception as e:
+        if connected and _connection_lost(e):
+            # Dropped mid-batch: not the messages' fault, they go back to the queue untouched
+            current_app.logger.warning("Outbox: SMTP connection lost, %d message(s) left for the next pass: %s",
+                                       len(remaining), e)
+            for email in remaining:
+                email.claimed_at = None
+        else:
+            # Lost the SMTP server: whatever is left in the batch is retried later
+            for email in remaining:
+                _record_failure(email, e, now)
+                failed += 1
+        db.session.commit()
+    return sent, failed
@@ -0,0 +1,101 @@
+"""Day-before reservation reminders, sent at most once per booking.
+
+Each reservation records its reminder state. A run claims a chunk of due
+bookings with a conditional UPDATE, sends them outside any transaction,
+then marks the delivered ones sent and releases the failed ones. Re-running
+the job (or a concurrent run) skips whatever is already sent or claimed, so
+an interrupted run simply resumes; claims left behind by a crashed run
+expire after REMINDER_CLAIM_SECONDS.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import or_, update
+from . import db
+from .mailer import DeliveryReport, send_bulk
+from .models import Reservation
+
+
+def reminder_message(reservation):
+    msg = Message(
+        subject='Rappel: Votre réservation demain - Le Lagon',
+        sender=current_app.config['MAIL_USERNAME'] or ('Le Lagon', 'noreply@lelagon.com'),
+        recipients=[reservation.email]
+    )
+    msg.body = f"""Bonjour {reservation.first_name},
+
+Ceci est un rappel pour votre réservation demain à {reservation.time.strftime('%H:%M')} pour {reservation.guests} personnes.
+
+Si vous avez un empêchement, merci de nous contacter.
+
+À demain !
+L'équipe Le Lagon
+"""
+    return msg
+
+
+def _due(day, stale_before):
+    return (
+        Reservation.date == day,
+        Reservation.status == 'confirmed',
+        Reservation.reminder_sent_at.is_(None),
+        or_(Reservation.reminder_claimed_at.is_(None), Reservation.reminder_claimed_at < stale_before),
+    )
+
+
+def _claim(ids, day, stale_before):
+    """Claim the still-due reservations among `ids`; returns the claimed rows."""
+    claimed_at = datetime.utcnow()
+    db.session.execute(
+        update(Reservation)
+        .where(Reservation.id.in_(ids), *_due(day, stale_before))
+        .values(reminder_claimed_at=claimed_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    rows = Reservation.query.filter(Reservation.id.in_(ids), Reservation.reminder_claimed_at == claimed_at).all()
+    return claimed_at, rows
+
+
+def _settle(claimed_at, sent, failed):
+    owned = (Reservation.reminder_claimed_at == claimed_at,)
+    if sent:
+        db.session.execute(
+            update(Reservation).where(Reservation.id.in_(sent), *owned)
+            .values(reminder_sent_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+    if failed:
+        db.session.execute(
+            update(Reservation).where(Reservation.id.in_(failed), *owned)
+            .values(reminder_claimed_at=None)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+
+
+def send_due_reminders(day, batch_size=None):
+    """Send the reminders still due for bookings on `day`; returns a DeliveryReport.
+
+    Bookings are walked in id order, `batch_size` at a time, so memory stays
+    flat and every chunk is committed before the next one is read.
+    """
+    batch_size = batch_size or current_app.config['REMINDER_BATCH_SIZE']
+    stale_before = datetime.utcnow() - timedelta(seconds=current_app.config['REMINDER_CLAIM_SECONDS'])
+    report = DeliveryReport()
+    last_id = 0
+    while True:
+        ids = [rid for (rid,) in Reservation.query.with_entities(Reservation.id)
+               .filter(Reservation.id > last_id, *_due(day, stale_before))
+               .order_by(Reservation.id).limit(batch_size)]
+        if not ids:
+            return report
+        last_id = ids[-1]
+
+        claimed_at, rows = _claim(ids, day, stale_before)
+        if not rows:
+            continue
+        messages = [(r.id, reminder_message(r)) for r in rows]
+        chunk = send_bulk(messages)
+        _settle(claimed_at, chunk.sent, list(chunk.failed))
+        report.merge(chunk)
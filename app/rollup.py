@@ -0,0 +1,154 @@
+"""Daily reservation rollup (daily_stats) for long-range dashboard views.
+
+Every flush that inserts, updates or deletes reservations adjusts the
+daily_stats rows of the dates involved, in the same transaction and with
+atomic increments so concurrent bookings never overwrite each other.
+The refresh_daily_stats job recomputes the days of recently changed
+bookings from scratch, which also picks up writes that bypass the ORM;
+`flask backfill-daily-stats` rebuilds the whole table.
+"""
+from datetime import datetime, time
+from sqlalchemy import case, event, func
+from . import db
+from .models import DailyStats, Reservation
+
+# Bookings starting at or after this hour count as dinner
+DINNER_FROM_HOUR = 17
+STATUS_COLUMNS = ('pending', 'confirmed', 'completed', 'cancelled')
+COUNTERS = ('reservations', 'covers', 'lunch_covers', 'dinner_covers') + STATUS_COLUMNS
+
+
+def contribution(start_time, guests, status):
+    """What one booking adds to its day's DailyStats row, as {column: count}."""
+    covers = 0 if status == 'cancelled' else (guests or 0)
+    dinner = start_time is not None and start_time.hour >= DINNER_FROM_HOUR
+    counts = {'reservations': 1, 'covers': covers,
+              'lunch_covers': 0 if dinner else covers, 'dinner_covers': covers if dinner else 0}
+    if status in STATUS_COLUMNS:
+        counts[status] = 1
+    return counts
+
+
+def _add(deltas, day, counts, sign):
+    if day is None:
+        return
+    row = deltas.setdefault(day, dict.fromkeys(COUNTERS, 0))
+    for column, n in counts.items():
+        row[column] += sign * n
+
+
+def _state(reservation):
+    return reservation.date, reservation.time, reservation.guests, reservation.status
+
+
+def increment(session, deltas):
+    """Add {date: {column: delta}} to daily_stats, creating missing rows."""
+    table = DailyStats.__table__
+    dialect = session.get_bind().dialect.name
+    for day, counts in sorted(deltas.items()):
+        if not any(counts.values()):
+            continue
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(table).values(date=day, **counts)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.date],
+                set_={column: table.c[column] + stmt.excluded[column] for column in COUNTERS},
+            )
+            session.execute(stmt)
+        else:
+            updated = session.execute(
+                table.update().where(table.c.date == day)
+                .values({column: table.c[column] + n for column, n in counts.items()})
+            )
+            if not updated.rowcount:
+                session.execute(table.insert().values(date=day, **counts))
+    # Days left without bookings get no row, as after refresh()
+    session.execute(table.delete().where(table.c.date.in_(list(deltas)), table.c.reservations == 0))
+
+
+def _track_flush(session, flush_context, instances):
+    new = [obj for obj in session.new if isinstance(obj, Reservation)]
+    changed = [obj for obj in session.dirty if isinstance(obj, Reservation) and session.is_modified(obj)]
+    removed = [obj for obj in session.deleted if isinstance(obj, Reservation)]
+    if not (new or changed or removed):
+        return
+
+    # Values as stored before this flush: attribute history misses them when
+    # an expired attribute is overwritten without being read first.
+    stored = {}
+    ids = [obj.id for obj in changed + removed]
+    if ids:
+        with session.no_autoflush:
+            rows = session.query(Reservation.id, Reservation.date, Reservation.time, Reservation.guests,
+                                 Reservation.status).filter(Reservation.id.in_(ids))
+            stored = {row[0]: tuple(row[1:]) for row in rows}
+
+    deltas = {}
+    for obj in new:
+        day, start_time, guests, status = _state(obj)
+        _add(deltas, day, contribution(start_time, guests, status), 1)
+    for obj in changed + removed:
+        before = stored.get(obj.id)
+        after = _state(obj) if obj in changed else None
+        if before == after:
+            continue
+        for state, sign in ((before, -1), (after, 1)):
+            if state:
+                day, start_time, guests, status = state
+                _add(deltas, day, contribution(start_time, guests, status), sign)
+    if deltas:
+        increment(session, deltas)
+
+
+def init_app(app):
+    if not event.contains(db.session, 'before_flush', _track_flush):
+        event.listen(db.session, 'before_flush', _track_flush)
+
+
+def aggregate(*criteria):
+    """Query DailyStats-shaped rows (date first) computed from reservations."""
+    covers = case((Reservation.status != 'cancelled', Reservation.guests), else_=0)
+    dinner = Reservation.time >= time(DINNER_FROM_HOUR)
+    return (db.session.query(
+        Reservation.date,
+        func.count(Reservation.id),
+        func.sum(covers),
+        func.sum(case((dinner, 0), else_=covers)),
+        func.sum(case((dinner, covers), else_=0)),
+        *(func.sum(case((Reservation.status == status, 1), else_=0)) for status in STATUS_COLUMNS),
+    ).filter(*criteria).group_by(Reservation.date))
+
+
+def refresh(dates=None, since=None):
+    """Recompute daily_stats for `dates`, for dates on or after `since`, or for every date.
+
+    Returns the number of days written.
+    """
+    if dates is not None:
+        dates = sorted(set(dates))
+        if not dates:
+            return 0
+        scope = (Reservation.date.in_(dates),), (DailyStats.date.in_(dates),)
+    elif since is not None:
+        scope = (Reservation.date >= since,), (DailyStats.date >= since,)
+    else:
+        scope = (), ()
+
+    rows = [dict(zip(('date',) + COUNTERS, row)) for row in aggregate(*scope[0])]
+    DailyStats.query.filter(*scope[1]).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(DailyStats.__table__.insert(), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def refresh_recent(lookback):
+    """Recompute the days of reservations created or updated in the last `lookback`."""
+    from .exports import CHANGED_AT
+    since = datetime.utcnow() - lookback
+    dates = [day for (day,) in Reservation.query.with_entities(Reservation.date).filter(CHANGED_AT >= since).distinct()]
+    return refresh(dates=dates)
@@ -2,6 +2,9 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from ..models import User, Reservation, MenuItem, Category, Settings
 from .. import db, limiter
+from .. import occupancy
+from ..menu import bump_menu_version
+from ..images import image_upload
 from datetime import date, datetime
 
 admin = Blueprint('admin', __name__)
@@ -37,38 +40,46 @@ def logout():
 @admin.route('/dashboard')
 @login_required
 def dashboard():
+    from ..stats import DASHBOARD_RANGES, dashboard_stats
+
     # Fetch recent reservations
     reservations = Reservation.query.order_by(Reservation.created_at.desc()).limit(10).all()
-    today_reservations = Reservation.query.filter(Reservation.date == date.today()).all()
-    today_count = len(today_reservations)
-    
-    # Calculate fill rate (Capacity = 50)
-    total_guests_today = sum(r.guests for r in today_reservations if r.status != 'cancelled')
-    fill_rate = (total_guests_today / 50) * 100 if total_guests_today > 0 else 0
-    
-    # Calculate stats for the last 7 days
-    from datetime import timedelta
-    chart_data = {'labels': [], 'values': []}
-    
-    for i in range(6, -1, -1):
-        day = date.today() - timedelta(days=i)
-        count = Reservation.query.filter(Reservation.date == day).count()
-        chart_data['labels'].append(day.strftime('%d/%m'))
-        chart_data['values'].append(count)
+
+    days = request.args.get('range', 7, type=int)
+    if days not in DASHBOARD_RANGES:
+        days = DASHBOARD_RANGES[0]
+    stats = dashboard_stats(days)
     
     return render_template('admin/dashboard.html', 
                          reservations=reservations, 
-                         today_reservations_count=today_count,
-                         fill_rate=round(fill_rate, 1),
-                         chart_data=chart_data)
+                         today_reservations_count=stats['today_count'],
+                         fill_rate=stats['fill_rate'],
+                         capacity=stats['capacity'],
+                         chart_data={'labels': stats['labels'], 'values': stats['values'], 'covers': stats['covers']},
+                         chart_days=days,
+                         chart_ranges=DASHBOARD_RANGES,
+                         stats=stats)
 
 # ========== RESERVATIONS MANAGEMENT ==========
 
 @admin.route('/reservations')
 @login_required
 def reservations():
+    """Reservations list, newest sitting first, ITEMS_PER_PAGE rows at a time.
+
+    Pages are keyset-paginated on (date, time, id): ?after= carries the last
+    row shown, so a page costs the same however far down the list it is.
+    HTMX requests (filters, infinite scroll) get the table body rows only.
+    """
+    from flask import abort, current_app
+    from sqlalchemy import tuple_
+    from .. import cache
+    from ..exports import decode_cursor, encode_cursor
+
     status_filter = request.args.get('status')
     search_query = request.args.get('search')
+    date_filter = request.args.get('date')
+    after = request.args.get('after')
     
     query = Reservation.query
     
@@ -81,14 +92,54 @@ def reservations():
             (Reservation.last_name.ilike(search_term)) | 
             (Reservation.first_name.ilike(search_term))
         )
-        
-    reservations = query.order_by(Reservation.date.desc(), Reservation.time.desc()).all()
+
+    if date_filter:
+        try:
+            query = query.filter(Reservation.date == datetime.strptime(date_filter, '%Y-%m-%d').date())
+        except ValueError:
+            date_filter = None
+
+    total = None
+    if not after:
+        # Counting scans every match: cache it per filter for a short while
+        count_key = f'reservations_count:{status_filter or ""}:{date_filter or ""}:{search_query or ""}'
+        total = cache.get(count_key)
+        if total is None:
+            total = query.order_by(None).count()
+            cache.set(count_key, total, timeout=current_app.config['RESERVATIONS_COUNT_TTL'])
+
+    page = query
+    if after:
+        try:
+            stamp, last_id = decode_cursor(after)
+        except ValueError:
+            abort(400)
+        page = page.filter(tuple_(Reservation.date, Reservation.time, Reservation.id) < (stamp.date(), stamp.time(), last_id))
+
+    per_page = current_app.config['ITEMS_PER_PAGE']
+    rows = page.order_by(Reservation.date.desc(), Reservation.time.desc(), Reservation.id.desc()).limit(per_page + 1).all()
+    reservations = rows[:per_page]
+
+    next_url = None
+    if len(rows) > per_page:
+        last = reservations[-1]
+        filters = {k: v for k, v in request.args.items() if k != 'after' and v}
+        next_url = url_for('admin.reservations', after=encode_cursor(datetime.combine(last.date, last.time), last.id), **filters)
+
+    context = dict(reservations=reservations, total=total, next_url=next_url)
     
-    # HTMX request handling for filtration
+    # HTMX request handling for filtration and infinite scroll
     if request.headers.get('HX-Request'):
-        return render_template('admin/partials/reservations_table_body.html', reservations=reservations)
+        return render_template('admin/partials/reservations_table_body.html', **context)
         
-    return render_template('admin/reservations.html', reservations=reservations)
+    return render_template('admin/reservations.html', **context)
+
+def _reservation_changed(reservation, close_modal=False):
+    """HTMX response for a changed booking: its row, and the dashboard counters out of band."""
+    from ..stats import dashboard_stats, invalidate_dashboard_stats
+    invalidate_dashboard_stats()
+    return render_template('admin/partials/reservation_changed.html', reservation=reservation,
+                           stats=dashboard_stats(), close_modal=close_modal)
 
 @admin.route('/reservations/<int:id>/status', methods=['POST'])
 @login_required
@@ -97,24 +148,28 @@ def update_reservation_status(id):
     new_status = request.form.get('status')
     
     if new_status in ['pending', 'confirmed', 'cancelled', 'completed']:
+        before = occupancy.snapshot(reservation)
         reservation.status = new_status
+        occupancy.track_change(before, reservation)
         db.session.commit()
         flash(f'Statut mis à jour : {new_status}', 'success')
     
     # Return updated row for HTMX
-    return render_template('admin/partials/reservation_row.html', reservation=reservation)
+    return _reservation_changed(reservation)
 
 @admin.route('/reservations/<int:id>/confirm', methods=['POST'])
 @login_required
 def confirm_reservation(id):
     reservation = Reservation.query.get_or_404(id)
+    before = occupancy.snapshot(reservation)
     reservation.status = 'confirmed'
+    occupancy.track_change(before, reservation)
     db.session.commit()
     
     # Send email (mockup logic already in place)
     
     # Return updated row for HTMX
-    return render_template('admin/partials/reservation_row.html', reservation=reservation)
+    return _reservation_changed(reservation)
 
 @admin.route('/reservations/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -126,40 +181,68 @@ def edit_reservation(id):
         
     # POST
     # Note: Complex validation skipped for Admin override power
-    reservation.date = datetime.strptime(request.form.get('date'), '%Y-%m-%d').date()
+    before = occupancy.snapshot(reservation)
+    new_date = datetime.strptime(request.form.get('date'), '%Y-%m-%d').date()
+    if new_date != reservation.date:
+        # Moved to another day: the customer needs a reminder for the new date
+        reservation.reminder_claimed_at = reservation.reminder_sent_at = None
+    reservation.date = new_date
     reservation.time = datetime.strptime(request.form.get('time'), '%H:%M').time()
     reservation.guests = int(request.form.get('guests'))
     reservation.status = request.form.get('status')
     reservation.internal_notes = request.form.get('internal_notes')
+    occupancy.track_change(before, reservation)
     
     db.session.commit()
-    return render_template('admin/partials/reservation_row.html', reservation=reservation)
+    return _reservation_changed(reservation, close_modal=True)
 
 @admin.route('/reservations/export')
 @login_required
 def export_reservations():
-    import csv
-    import io
-    from flask import Response
-    
-    reservations = Reservation.query.order_by(Reservation.date.desc()).all()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Headers
-    writer.writerow(['ID', 'Date', 'Heure', 'Nom', 'Prénom', 'Email', 'Téléphone', 'Couverts', 'Statut', 'Créé le'])
-    
-    for r in reservations:
-        writer.writerow([
-            r.id, r.date, r.time, r.last_name, r.first_name, 
-            r.email, r.phone, r.guests, r.status, r.created_at
-        ])
-        
+    """Reservations as CSV (default), NDJSON or columnar (?format=).
+
+    NDJSON and columnar exports are ordered by last change and carry an
+    X-Export-Cursor header; passing it back as ?since= returns only the
+    reservations created or updated in between.
+    """
+    from flask import Response, abort, stream_with_context
+    from ..compression import negotiate
+    from ..exports import (change_window, columnar_format, export_filters, gzip_stream,
+                           iter_columnar, iter_csv, iter_ndjson)
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson', 'columnar'):
+        abort(400)
+    cursor = None
+    try:
+        criteria = export_filters(request.args)
+        # A CSV is a full listing unless a delta is asked for
+        if export_format != 'csv' or request.args.get('since'):
+            window, cursor = change_window(request.args.get('since'))
+            criteria += window
+    except ValueError:
+        abort(400)
+
+    if export_format == 'csv':
+        body, mimetype, extension = iter_csv(criteria), 'text/csv', 'csv'
+    elif export_format == 'ndjson':
+        body, mimetype, extension = iter_ndjson(criteria), 'application/x-ndjson', 'ndjson'
+    else:
+        body = iter_columnar(criteria)
+        mimetype, extension = columnar_format()
+
+    headers = {"Content-disposition": f"attachment; filename=reservations_export.{extension}",
+               "Vary": "Accept-Encoding"}
+    if cursor:
+        headers['X-Export-Cursor'] = cursor
+    if negotiate(request.headers.get('Accept-Encoding'), available=('gzip',)):
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+
     return Response(
-        output.getvalue(),
-        mimetype="text/csv",
-        headers={"Content-disposition": "attachment; filename=reservations_export.csv"}
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers=headers
     )
 
 # ========== MENU MANAGEMENT ==========
@@ -225,6 +308,7 @@ def edit_category(id):
         cat.name = name
         cat.slug = slug
         db.session.commit()
+        bump_menu_version()
         flash('Catégorie mise à jour.', 'success')
         return redirect(url_for('admin.categories'))
 
@@ -245,7 +329,21 @@ def delete_category(id):
     flash('Catégorie supprimée.', 'success')
     return redirect(url_for('admin.categories'))
 
+def _upload_image():
+    """Process the form's image_file into variants: (image_url, image_variants), or None."""
+    file = request.files.get('image_file')
+    if not file or file.filename == '':
+        return None
+    from ..images import InvalidImage, process_upload
+    try:
+        return process_upload(file)
+    except (InvalidImage, TimeoutError) as e:
+        print(f"Image upload rejected: {e}")
+        flash("L'image n'a pas pu être traitée.", 'error')
+        return None
+
 @admin.route('/menu/add', methods=['POST'])
+@image_upload
 @login_required
 def add_menu_item():
     name = request.form.get('name')
@@ -255,20 +353,10 @@ def add_menu_item():
     
     # Handle Image Upload
     image_url = request.form.get('image_url') # Fallback
-    if 'image_file' in request.files:
-        file = request.files['image_file']
-        if file and file.filename != '':
-            from werkzeug.utils import secure_filename
-            import os
-            from flask import current_app
-            
-            filename = secure_filename(file.filename)
-            # Add timestamp to ensure uniqueness
-            import time
-            filename = f"{int(time.time())}_{filename}"
-            
-            file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-            image_url = url_for('static', filename=f'uploads/{filename}')
+    image_variants = None
+    uploaded = _upload_image()
+    if uploaded:
+        image_url, image_variants = uploaded
 
     item = MenuItem(
         name=name,
@@ -276,12 +364,14 @@ def add_menu_item():
         description=description,
         price=price,
         image_url=image_url,
+        image_variants=image_variants,
         is_special=request.form.get('is_special') == 'true',
         is_available=request.form.get('is_available') == 'true'
     )
     
     db.session.add(item)
     db.session.commit()
+    bump_menu_version()
 
     html = render_template('admin/partials/menu_item_card.html', item=item)
     from flask import make_response
@@ -291,6 +381,7 @@ def add_menu_item():
     return response
 
 @admin.route('/menu/<int:id>/edit', methods=['GET', 'POST'])
+@image_upload
 @login_required
 def edit_menu_item(id):
     item = MenuItem.query.get_or_404(id)
@@ -306,25 +397,19 @@ def edit_menu_item(id):
     item.price = float(request.form.get('price'))
     
     # Handle Image Update
-    if 'image_file' in request.files:
-        file = request.files['image_file']
-        if file and file.filename != '':
-            from werkzeug.utils import secure_filename
-            import os
-            from flask import current_app
-            import time
-            
-            filename = secure_filename(file.filename)
-            filename = f"{int(time.time())}_{filename}"
-            file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-            item.image_url = url_for('static', filename=f'uploads/{filename}')
-    elif request.form.get('image_url'):
-         item.image_url = request.form.get('image_url')
+    uploaded = _upload_image()
+    if uploaded:
+        item.image_url, item.image_variants = uploaded
+    elif request.form.get('image_url') and request.form.get('image_url') != item.image_url:
+        # An external URL replaces the uploaded photo and its variants
+        item.image_url = request.form.get('image_url')
+        item.image_variants = None
 
     item.is_special = request.form.get('is_special') == 'true'
     item.is_available = request.form.get('is_available') == 'true'
     
     db.session.commit()
+    bump_menu_version()
     html = render_template('admin/partials/menu_item_card.html', item=item)
     from flask import make_response
     response = make_response(html)
@@ -337,6 +422,7 @@ def toggle_menu_item(id):
     item = MenuItem.query.get_or_404(id)
     item.is_available = not item.is_available
     db.session.commit()
+    bump_menu_version()
     
     return render_template('admin/partials/menu_item_card.html', item=item)
 
@@ -356,6 +442,7 @@ def reorder_menu():
             item.order = index
             
     db.session.commit()
+    bump_menu_version()
     return {'status': 'success'}
 
 @admin.route('/menu/<int:id>', methods=['DELETE'])
@@ -364,6 +451,7 @@ def delete_menu_item(id):
     item = MenuItem.query.get_or_404(id)
     db.session.delete(item)
     db.session.commit()
+    bump_menu_version()
     # Also support HTMX triggers for public menu refresh
     from flask import make_response
     response = make_response('', 200)
@@ -378,6 +466,7 @@ def delete_menu_post(id):
     item = MenuItem.query.get_or_404(id)
     db.session.delete(item)
     db.session.commit()
+    bump_menu_version()
     from flask import make_response
     response = make_response('', 200)
     response.headers['HX-Trigger'] = 'menuUpdated'
@@ -411,21 +500,29 @@ def settings():
         closed_dates = [d.strip() for d in closed_dates_raw.split(',')] if closed_dates_raw else []
         notif_list = [e.strip() for e in notification_emails.split(',')] if notification_emails else []
 
+        values = {
+            'OPENING_HOURS': opening_hours,
+            'CLOSED_DATES': closed_dates,
+            'ADDRESS': address,
+            'PHONE': phone,
+            'CONTACT_EMAIL': contact_email,
+            'NOTIFICATION_EMAILS': notif_list,
+        }
         if capacity:
-            Settings.set('CAPACITY', int(capacity))
+            values['CAPACITY'] = int(capacity)
         if table_duration:
-            Settings.set('TABLE_DURATION_MINUTES', int(table_duration))
+            values['TABLE_DURATION_MINUTES'] = int(table_duration)
         if res_min:
-            Settings.set('RESERVATION_MIN_HOURS', int(res_min))
+            values['RESERVATION_MIN_HOURS'] = int(res_min)
         if res_max:
-            Settings.set('RESERVATION_MAX_DAYS', int(res_max))
-
-        Settings.set('OPENING_HOURS', opening_hours, as_json=True)
-        Settings.set('CLOSED_DATES', closed_dates, as_json=True)
-        Settings.set('ADDRESS', address)
-        Settings.set('PHONE', phone)
-        Settings.set('CONTACT_EMAIL', contact_email)
-        Settings.set('NOTIFICATION_EMAILS', notif_list, as_json=True)
+            values['RESERVATION_MAX_DAYS'] = int(res_max)
+
+        duration_changed = bool(table_duration) and str(int(table_duration)) != Settings.get('TABLE_DURATION_MINUTES')
+        Settings.set_many(values, json_keys=Settings.JSON_KEYS)
+
+        # Stored occupancy spans depend on the table duration
+        if duration_changed:
+            occupancy.rebuild(since=date.today())
 
         flash('Paramètres sauvegardés.', 'success')
         return redirect(url_for('admin.settings'))
@@ -1,33 +1,19 @@
 from flask import Blueprint, render_template, request
-from datetime import datetime, timedelta
-from ..models import MenuItem, Category, Reservation, Settings
-from flask import current_app
+from datetime import datetime
+from ..http_cache import conditional_response
+from ..menu import menu_last_modified, menu_version, render_menu_items
+from ..occupancy import DayOccupancy, reservation_rules, service_slots
 
 api = Blueprint('api', __name__)
 
 @api.route('/menu/filter')
 def filter_menu():
     category_slug = request.args.get('category', 'all')
-    search_query = request.args.get('q', '').lower()
+    search_query = request.args.get('q', '').strip().lower()
     is_vegetarian = request.args.get('vegetarian') == 'true'
-    
-    query = MenuItem.query.filter_by(is_available=True)
-    
-    # Filter by category
-    if category_slug != 'all':
-        query = query.join(Category).filter(Category.slug == category_slug)
-    
-    # Filter by search query
-    if search_query:
-        query = query.filter(MenuItem.name.ilike(f'%{search_query}%'))
-    
-    # Filter by vegetarian
-    if is_vegetarian:
-        query = query.filter(MenuItem.dietary_tags.ilike('%vegetarian%'))
-    
-    items = query.order_by(MenuItem.order).all()
-    
-    return render_template('components/menu_items.html', items=items)
+
+    return conditional_response(lambda: render_menu_items(category_slug, search_query, is_vegetarian),
+                                menu_version(), last_modified=menu_last_modified())
 
 @api.route('/check-availability', methods=['POST'])
 def check_availability():
@@ -58,56 +44,17 @@ def check_availability():
             requested = 1
 
     # Read capacity and table duration from settings (with fallbacks)
-    try:
-        capacity = int(Settings.get('CAPACITY', default=current_app.config.get('CAPACITY', 50)))
-    except Exception:
-        capacity = int(current_app.config.get('CAPACITY', 50))
-
-    try:
-        td_minutes = int(Settings.get('TABLE_DURATION_MINUTES', default=current_app.config.get('DEFAULT_TABLE_DURATION_MINUTES', 120)))
-    except Exception:
-        td_minutes = int(current_app.config.get('DEFAULT_TABLE_DURATION_MINUTES', 120))
-
-    table_duration = timedelta(minutes=td_minutes)
+    capacity, td_minutes = reservation_rules()
 
-    # Fetch existing reservations for the date
-    existing = Reservation.query.filter(Reservation.date == selected_date, Reservation.status != 'cancelled').all()
+    # Seat occupancy for the date, built once and queried per slot
+    occupancy = DayOccupancy.for_date(selected_date, td_minutes)
 
     def slot_is_available(slot_time_str):
         slot_time = datetime.strptime(slot_time_str, '%H:%M').time()
-        slot_start = datetime.combine(selected_date, slot_time)
-        slot_end = slot_start + table_duration
-
-        overlapping = 0
-        for r in existing:
-            try:
-                r_start = datetime.combine(r.date, r.time)
-            except Exception:
-                continue
-            r_end = r_start + table_duration
-            if not (r_end <= slot_start or r_start >= slot_end):
-                overlapping += (r.guests or 0)
-
-        return (capacity - overlapping) >= requested
-
-    # Generate lunch slots (12:00 to 14:00)
-    lunch_slots = []
-    current_slot = datetime.strptime('12:00', '%H:%M')
-    end_slot = datetime.strptime('14:00', '%H:%M')
-    while current_slot <= end_slot:
-        s = current_slot.strftime('%H:%M')
-        if slot_is_available(s):
-            lunch_slots.append(s)
-        current_slot += timedelta(minutes=30)
+        return occupancy.fits(slot_time, requested, capacity)
 
-    # Generate dinner slots (19:00 to 22:00)
-    dinner_slots = []
-    current_slot = datetime.strptime('19:00', '%H:%M')
-    end_slot = datetime.strptime('22:00', '%H:%M')
-    while current_slot <= end_slot:
-        s = current_slot.strftime('%H:%M')
-        if slot_is_available(s):
-            dinner_slots.append(s)
-        current_slot += timedelta(minutes=30)
+    # Lunch slots (12:00 to 14:00) and dinner slots (19:00 to 22:00)
+    lunch_slots = [s for s in service_slots('12:00', '14:00') if slot_is_available(s)]
+    dinner_slots = [s for s in service_slots('19:00', '22:00') if slot_is_available(s)]
 
     return render_template('components/slots.html', slots={'lunch': lunch_slots, 'dinner': dinner_slots})
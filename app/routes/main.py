@@ -1,17 +1,21 @@
-from flask import Blueprint, render_template, Response, url_for, current_app, redirect, request, flash
-from .. import mail, db
-from flask_mail import Message as MailMessage
+from flask import Blueprint, render_template, url_for, current_app, redirect, request, flash
+from .. import db
 from datetime import datetime
+from ..http_cache import conditional_response
+from ..models import Settings
+from ..outbox import enqueue_email
 
 main = Blueprint('main', __name__)
 
 @main.route('/')
 def index():
-    return render_template('index.html')
+    return conditional_response(lambda: render_template('index.html'),
+                                Settings.version(), last_modified=Settings.last_modified())
 
 @main.route('/menu')
 def menu():
-    return render_template('menu.html')
+    return conditional_response(lambda: render_template('menu.html'),
+                                Settings.version(), last_modified=Settings.last_modified())
 
 @main.route('/reservation') # Explicit alias if needed, primarily handled by blueprint but good for sitemap
 def reservation_redirect():
@@ -62,18 +66,15 @@ def contact():
         if not recipients:
             recipients = [current_app.config.get('MAIL_DEFAULT_RECEIVER') or Settings.get('CONTACT_EMAIL', default=None) or current_app.config.get('CONTACT_EMAIL')]
 
-        # Send email if mail is configured and recipients available
+        # Queue the notification if recipients are available (sent by the outbox job)
         try:
-            if mail and recipients and recipients[0]:
-                msg = MailMessage(subject=f"Contact form: {name or 'Sans nom'}",
-                              sender=email or current_app.config.get('MAIL_DEFAULT_SENDER'),
-                              recipients=[r for r in recipients if r])
+            if recipients and recipients[0]:
                 body = f"Nom: {name}\nEmail: {email}\n\nMessage:\n{message}"
-                msg.body = body
-                mail.send(msg)
+                enqueue_email(f"Contact form: {name or 'Sans nom'}", recipients, body,
+                              sender=email or current_app.config.get('MAIL_DEFAULT_SENDER'))
         except Exception:
             # Don't fail on email errors; continue
-            pass
+            db.session.rollback()
 
         flash('Votre message a bien été envoyé. Nous vous répondrons dès que possible.', 'success')
         return redirect(url_for('main.contact'))
@@ -87,26 +88,34 @@ def mentions_legales():
 @main.route('/sitemap.xml')
 def sitemap():
     """Generate sitemap.xml dynamically."""
-    pages = []
-    
-    # Static pages
-    for rule in current_app.url_map.iter_rules():
-        if "GET" in rule.methods and len(rule.arguments) == 0:
-            if not rule.rule.startswith('/admin') and not rule.rule.startswith('/api'):
-                 pages.append(
-                     [url_for(rule.endpoint, _external=True), datetime.now().date().isoformat()]
-                 )
-    
-    sitemap_xml = render_template('sitemap_template.xml', pages=pages)
-    return Response(sitemap_xml, mimetype='application/xml')
+    today = datetime.now().date().isoformat()
+
+    def render():
+        pages = []
+
+        # Static pages
+        for rule in current_app.url_map.iter_rules():
+            if "GET" in rule.methods and len(rule.arguments) == 0:
+                if not rule.rule.startswith('/admin') and not rule.rule.startswith('/api'):
+                     pages.append(
+                         [url_for(rule.endpoint, _external=True), today]
+                     )
+
+        return render_template('sitemap_template.xml', pages=pages)
+
+    # <lastmod> is today's date, so the tag rolls over daily
+    return conditional_response(render, today, mimetype='application/xml')
 
 @main.route('/robots.txt')
 def robots():
     """Generate robots.txt."""
-    lines = [
-        "User-agent: *",
-        "Disallow: /admin/",
-        "Disallow: /api/",
-        f"Sitemap: {url_for('main.sitemap', _external=True)}"
-    ]
-    return Response("\n".join(lines), mimetype='text/plain')
+    def render():
+        lines = [
+            "User-agent: *",
+            "Disallow: /admin/",
+            "Disallow: /api/",
+            f"Sitemap: {url_for('main.sitemap', _external=True)}"
+        ]
+        return "\n".join(lines)
+
+    return conditional_response(render, mimetype='text/plain')
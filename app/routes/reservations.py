@@ -1,7 +1,9 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash
 from datetime import datetime, timedelta
 from .. import db, limiter
 from ..models import Reservation
+from ..occupancy import admit
+from ..outbox import compose_email
 
 reservations = Blueprint('reservations', __name__)
 
@@ -46,11 +48,7 @@ def confirm():
             return redirect(url_for('reservations.index'))
 
         # Business rules
-        capacity = int(current_app.config.get('CAPACITY', 50))
-        table_duration = timedelta(hours=2)
-
         new_start = datetime.combine(date_obj, time_obj)
-        new_end = new_start + table_duration
         now = datetime.now()
 
         # No reservations less than 2 hours from now
@@ -63,23 +61,6 @@ def confirm():
             flash('Les réservations ne peuvent pas être faites plus de 2 mois à l\'avance.', 'error')
             return redirect(url_for('reservations.index'))
 
-        # Check capacity for overlapping reservations on the same date
-        overlapping_guests = 0
-        existing = Reservation.query.filter(Reservation.date == date_obj, Reservation.status != 'cancelled').all()
-        for r in existing:
-            try:
-                exist_start = datetime.combine(r.date, r.time)
-            except Exception:
-                continue
-            exist_end = exist_start + table_duration
-            # intervals overlap?
-            if not (exist_end <= new_start or exist_start >= new_end):
-                overlapping_guests += (r.guests or 0)
-
-        if overlapping_guests + guests_int > capacity:
-            flash('Désolé, il n\'y a plus de places disponibles pour ce créneau.', 'error')
-            return redirect(url_for('reservations.index'))
-
         # Create reservation object
         reservation = Reservation(
             date=date_obj,
@@ -93,20 +74,9 @@ def confirm():
             status='confirmed' # Auto-confirm for MVP
         )
 
-        db.session.add(reservation)
-        db.session.commit()
-
-        # Send confirmation email
-        try:
-            from flask_mail import Message
-            from .. import mail
-            
-            msg = Message(
-                subject=f'Confirmation de réservation - Le Lagon - {date_str}',
-                sender=current_app.config['MAIL_USERNAME'] or ('Le Lagon', 'noreply@lelagon.com'),
-                recipients=[email]
-            )
-            msg.body = f"""Bonjour {first_name} {last_name},
+        # Confirmation email, sent in the background by the outbox job; it is
+        # committed with the booking so neither exists without the other
+        body = f"""Bonjour {first_name} {last_name},
 
 Votre réservation au restaurant Le Lagon est confirmée.
 
@@ -121,10 +91,12 @@ Nous avons hâte de vous accueillir !
 Cordialement,
 L'équipe Le Lagon
 """
-            mail.send(msg)
-        except Exception as e:
-            # Log error but don't fail the request
-            print(f"Error sending email: {e}")
+        confirmation = compose_email(f'Confirmation de réservation - Le Lagon - {date_str}', [email], body)
+
+        # Capacity check and insert are serialised per date
+        if not admit(reservation, confirmation):
+            flash('Désolé, il n\'y a plus de places disponibles pour ce créneau.', 'error')
+            return redirect(url_for('reservations.index'))
 
         flash('Votre réservation a été confirmée avec succès ! Un email vous sera envoyé.', 'success')
         return redirect(url_for('main.index'))
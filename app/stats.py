@@ -0,0 +1,68 @@
+"""Dashboard statistics, read from the daily_stats rollup and cached briefly."""
+from datetime import date, timedelta
+from flask import current_app
+from . import cache
+from .models import DailyStats
+from .occupancy import reservation_rules
+
+# Chart ranges offered on the dashboard, in days
+DASHBOARD_RANGES = (7, 30, 90, 365)
+
+
+def daily_totals(start, end):
+    """Return {date: DailyStats} for dates in [start, end] with bookings, in one query."""
+    rows = DailyStats.query.filter(DailyStats.date >= start, DailyStats.date <= end)
+    return {row.date: row for row in rows}
+
+
+def dashboard_stats(days=7, today=None):
+    """Chart series over the last `days` days plus today's count, covers and fill rate."""
+    today = today or date.today()
+    key = f'dashboard_stats:{days}:{today.isoformat()}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = _compute(days, today)
+        cache.set(key, stats, timeout=current_app.config['DASHBOARD_STATS_TTL'])
+    return stats
+
+
+def invalidate_dashboard_stats(today=None):
+    """Drop today's cached dashboard statistics, for every range, after a booking changed."""
+    today = today or date.today()
+    cache.delete_many(*(f'dashboard_stats:{days}:{today.isoformat()}' for days in DASHBOARD_RANGES))
+
+
+def _compute(days, today):
+    start = today - timedelta(days=days - 1)
+    totals = daily_totals(start, today)
+    capacity, _ = reservation_rules()
+
+    labels, values, covers = [], [], []
+    for i in range(days):
+        day = start + timedelta(days=i)
+        row = totals.get(day)
+        labels.append(day.strftime('%d/%m'))
+        values.append(row.reservations if row else 0)
+        covers.append(row.covers if row else 0)
+
+    # Past bookings still 'confirmed' were never marked completed: no-shows
+    past = [row for day, row in totals.items() if day < today]
+    honoured = sum(row.completed for row in past)
+    no_shows = sum(row.confirmed for row in past)
+
+    today_row = totals.get(today)
+    today_count = today_row.reservations if today_row else 0
+    today_covers = today_row.covers if today_row else 0
+    return {
+        'days': days,
+        'labels': labels,
+        'values': values,
+        'covers': covers,
+        'today_count': today_count,
+        'today_covers': today_covers,
+        'capacity': capacity,
+        'fill_rate': round(today_covers / capacity * 100, 1) if capacity else 0,
+        'lunch_covers': sum(row.lunch_covers for row in totals.values()),
+        'dinner_covers': sum(row.dinner_covers for row in totals.values()),
+        'no_show_rate': round(no_shows / (honoured + no_shows) * 100, 1) if honoured + no_shows else 0,
+    }
@@ -1,32 +1,34 @@
-from . import scheduler, db, mail
-from .models import Reservation
-from flask_mail import Message
+from . import scheduler
+from .outbox import deliver_pending
+from .reminders import send_due_reminders
+from . import rollup
 from datetime import datetime, timedelta
-from flask import current_app
+
 
 def send_reminders():
     """Send reminders for reservations tomorrow."""
     with scheduler.app.app_context():
         tomorrow = datetime.now().date() + timedelta(days=1)
-        reservations = Reservation.query.filter_by(date=tomorrow, status='confirmed').all()
-        
-        for reservation in reservations:
-            try:
-                msg = Message(
-                    subject=f'Rappel: Votre réservation demain - Le Lagon',
-                    sender=current_app.config['MAIL_USERNAME'] or ('Le Lagon', 'noreply@lelagon.com'),
-                    recipients=[reservation.email]
-                )
-                msg.body = f"""Bonjour {reservation.first_name},
+        report = send_due_reminders(tomorrow)
+        for reservation_id, error in report.failed.items():
+            print(f"Failed to send reminder for reservation {reservation_id}: {error}")
+        if report.sent or report.failed:
+            print(f"Reminders: {report.summary()}")
+        return report
+
 
-Ceci est un rappel pour votre réservation demain à {reservation.time.strftime('%H:%M')} pour {reservation.guests} personnes.
+def deliver_outbox():
+    """Send queued emails (see app.outbox)."""
+    with scheduler.app.app_context():
+        sent, failed = deliver_pending()
+        if sent or failed:
+            print(f"Outbox: {sent} sent, {failed} failed")
 
-Si vous avez un empêchement, merci de nous contacter.
 
-À demain !
-L'équipe Le Lagon
-"""
-                mail.send(msg)
-                print(f"Reminder sent to {reservation.email}")
-            except Exception as e:
-                print(f"Failed to send reminder to {reservation.email}: {e}")
+def refresh_daily_stats():
+    """Recompute the daily_stats rows of recently changed reservations."""
+    with scheduler.app.app_context():
+        lookback = timedelta(minutes=scheduler.app.config['ROLLUP_LOOKBACK_MINUTES'])
+        days = rollup.refresh_recent(lookback)
+        if days:
+            print(f"Daily stats: {days} day(s) refreshed")
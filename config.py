@@ -13,9 +13,53 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL')
+    # Parallel SMTP connections used for bulk sends (reminders)
+    MAIL_POOL_SIZE = int(os.environ.get('MAIL_POOL_SIZE') or 4)
+    # First run of the reminder job; it is retried every half hour until 20:00
+    REMINDER_HOUR = min(max(int(os.environ.get('REMINDER_HOUR') or 10), 0), 23)
+    REMINDER_BATCH_SIZE = 100
+    # A claimed reminder not marked sent after this long (crashed run) is retried
+    REMINDER_CLAIM_SECONDS = 15 * 60
+    # Outbox: emails are queued by request handlers and sent by a scheduler job
+    OUTBOX_POLL_SECONDS = int(os.environ.get('OUTBOX_POLL_SECONDS') or 15)
+    OUTBOX_BATCH_SIZE = 50
+    OUTBOX_MAX_ATTEMPTS = 6
+    OUTBOX_RETRY_BASE_SECONDS = 30 # doubled after each failed attempt
+    # A claimed message not marked sent after this long (crashed pass) is retried
+    OUTBOX_CLAIM_SECONDS = 15 * 60
     UPLOAD_FOLDER = os.path.join(basedir, 'app', 'static', 'uploads')
+    # Uploads being received and variants being rendered, kept out of static/
+    # until they are complete (default: the system temporary directory)
+    UPLOAD_TEMP_FOLDER = os.environ.get('UPLOAD_TEMP_FOLDER')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024 # 16MB max upload
+    # Link static files by content hash and cache them for good (see app.assets)
+    ASSET_FINGERPRINTS = True
+    # gzip/brotli for text responses of at least COMPRESS_MIN_SIZE bytes (see app.compression)
+    COMPRESS_RESPONSES = True
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4
+    # Menu photos (see app.images): variant widths and formats, best first; the last one is the <img> fallback
+    # (JPEG when this Pillow build can encode none of them)
+    IMAGE_WIDTHS = (320, 640, 1280)
+    IMAGE_FORMATS = ('avif', 'webp')
+    IMAGE_QUALITY = 80
+    # Uploads whose header declares more pixels are rejected before decoding (decompression bombs)
+    IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+    # Size of the process pool decoding uploads (0 processes them in the request's own process)
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS') or 2)
+    IMAGE_PROCESS_TIMEOUT = 60
     ITEMS_PER_PAGE = 25
+    # How long the admin reservations list may show a stale match count
+    RESERVATIONS_COUNT_TTL = 60
+    DASHBOARD_STATS_TTL = 60
+    # daily_stats reconciliation: every ROLLUP_REFRESH_MINUTES, days of bookings changed in the last ROLLUP_LOOKBACK_MINUTES
+    ROLLUP_REFRESH_MINUTES = 10
+    ROLLUP_LOOKBACK_MINUTES = 60
+    # Flask-Caching: per-process by default, set CACHE_TYPE=RedisCache to share between workers
+    CACHE_TYPE = os.environ.get('CACHE_TYPE') or 'SimpleCache'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+    CACHE_DEFAULT_TIMEOUT = 3600
     # Business defaults
     CAPACITY = int(os.environ.get('CAPACITY') or 50)
     # Reservation / business defaults
@@ -33,12 +77,54 @@ class Config:
         '6': {'lunch': ['12:00', '14:30'], 'dinner': ['19:00', '22:30']},
     }
     
+    # Only one process runs JOBS (see app.leader): 'auto' locks through the
+    # database (advisory lock on PostgreSQL, lease row otherwise), 'file' uses
+    # a lock file (single host), 'none' runs the scheduler in every process.
+    SCHEDULER_LOCK = os.environ.get('SCHEDULER_LOCK') or 'auto'
+    SCHEDULER_LOCK_FILE = os.environ.get('SCHEDULER_LOCK_FILE')
+    # A leader that stops renewing for this long is replaced
+    SCHEDULER_LEASE_SECONDS = 30
+
+    JOBS = [
+        {
+            'id': 'deliver_outbox',
+            'func': 'app.tasks:deliver_outbox',
+            'trigger': 'interval',
+            'seconds': OUTBOX_POLL_SECONDS,
+            'max_instances': 1,
+            'coalesce': True,
+            'replace_existing': True,
+        },
+        {
+            'id': 'refresh_daily_stats',
+            'func': 'app.tasks:refresh_daily_stats',
+            'trigger': 'interval',
+            'minutes': ROLLUP_REFRESH_MINUTES,
+            'max_instances': 1,
+            'coalesce': True,
+            'replace_existing': True,
+        },
+        {
+            'id': 'send_reminders',
+            'func': 'app.tasks:send_reminders',
+            # Re-runs only pick up what is still unsent, so retry through the day
+            'trigger': 'cron',
+            'hour': f'{REMINDER_HOUR}-{max(REMINDER_HOUR, 20)}',
+            'minute': '0,30',
+            'max_instances': 1,
+            'coalesce': True,
+            'replace_existing': True,
+        },
+    ]
+
     @staticmethod
     def init_app(app):
         pass
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    # The manifest is computed at startup: keep plain URLs while editing CSS
+    ASSET_FINGERPRINTS = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
 
@@ -50,6 +136,8 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    JOBS = []
+    IMAGE_WORKERS = 0
 
 config = {
     'development': DevelopmentConfig,
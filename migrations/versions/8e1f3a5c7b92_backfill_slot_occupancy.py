@@ -0,0 +1,60 @@
+"""Backfill slot occupancy
+
+Revision ID: 8e1f3a5c7b92
+Revises: 5d9b2e7c4a18
+Create Date: 2026-10-18 16:40:12.804517
+
+"""
+from alembic import op
+from flask import current_app
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e1f3a5c7b92'
+down_revision = '5d9b2e7c4a18'
+branch_labels = None
+depends_on = None
+
+# As in app.occupancy at this revision
+BUCKET_MINUTES = 15
+DAY_BUCKETS = 2 * 24 * 60 // BUCKET_MINUTES
+
+settings = sa.table('settings', sa.column('key', sa.String), sa.column('value', sa.Text))
+reservations = sa.table('reservations', sa.column('date', sa.Date), sa.column('time', sa.Time),
+                        sa.column('guests', sa.Integer), sa.column('status', sa.String))
+slot_occupancy = sa.table('slot_occupancy', sa.column('date', sa.Date), sa.column('bucket', sa.Integer),
+                          sa.column('covers', sa.Integer))
+
+
+def upgrade():
+    # Until now the table was only filled by `flask rebuild-occupancy`: with
+    # no rows every capacity check passes, so recompute it from the bookings
+    bind = op.get_bind()
+    duration = bind.execute(
+        sa.select(settings.c.value).where(settings.c.key == 'TABLE_DURATION_MINUTES')).scalar()
+    try:
+        duration = int(duration)
+    except (TypeError, ValueError):
+        duration = int(current_app.config.get('DEFAULT_TABLE_DURATION_MINUTES', 120))
+
+    covers = {}
+    rows = bind.execute(sa.select(reservations.c.date, reservations.c.time, reservations.c.guests)
+                        .where(reservations.c.status != 'cancelled'))
+    for day, start_time, guests in rows:
+        if not guests:
+            continue
+        start = start_time.hour * 60 + start_time.minute
+        last = min(-(-(start + duration) // BUCKET_MINUTES), DAY_BUCKETS)
+        for bucket in range(start // BUCKET_MINUTES, last):
+            covers[day, bucket] = covers.get((day, bucket), 0) + guests
+
+    op.execute(slot_occupancy.delete())
+    if covers:
+        op.bulk_insert(slot_occupancy, [{'date': day, 'bucket': bucket, 'covers': c}
+                                        for (day, bucket), c in sorted(covers.items())])
+
+
+def downgrade():
+    # Data only: the rows stay consistent with the schema of the previous revision
+    pass
@@ -2,7 +2,7 @@ from app import create_app, db
 from app.models import User, Category, MenuItem
 import os
 
-app = create_app('default')
+app = create_app('default', start_scheduler=False)
 
 with app.app_context():
     # Create Admin User
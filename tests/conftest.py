@@ -1,15 +1,16 @@
 import pytest
-from app import create_app, db
+from app import create_app, db, mail
 from app.models import User
 
 @pytest.fixture
-def app():
+def app(tmp_path):
     app = create_app('testing')
     app.config.update({
         'TESTING': True,
         'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
         'WTF_CSRF_ENABLED': False,
-        'SERVER_NAME': 'localhost.localdomain'
+        'SERVER_NAME': 'localhost.localdomain',
+        'UPLOAD_FOLDER': str(tmp_path)
     })
 
     with app.app_context():
@@ -22,6 +23,96 @@ def app():
 def client(app):
     return app.test_client()
 
+@pytest.fixture
+def admin_client(client):
+    """`client`, logged in as an admin user."""
+    user = User(username='admin', email='admin@example.com')
+    user.password = 'secret'
+    db.session.add(user)
+    db.session.commit()
+    client.post('/admin/login', data={'email': 'admin@example.com', 'password': 'secret'})
+    return client
+
 @pytest.fixture
 def runner(app):
     return app.test_cli_runner()
+
+
+class FakeSMTPServer:
+    """Minimal threaded SMTP server recording delivered messages.
+
+    `reject` is the number of upcoming messages to refuse with a 451 reply;
+    once `drop_after` messages are delivered, the next DATA hangs up.
+    """
+
+    def __init__(self):
+        import socketserver
+        import threading
+
+        self.messages = []
+        self.connections = 0
+        self.reject = 0
+        self.drop_after = None
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode() + b'\r\n')
+
+            def handle(self):
+                server.connections += 1
+                self.reply('220 localhost fake SMTP')
+                envelope = {'rcpt': []}
+                while True:
+                    line = self.rfile.readline().decode(errors='replace').strip()
+                    command = line[:4].upper()
+                    if not line or command == 'QUIT':
+                        self.reply('221 bye')
+                        return
+                    if command in ('EHLO', 'HELO'):
+                        self.reply('250 localhost')
+                    elif command == 'MAIL':
+                        envelope = {'from': line, 'rcpt': []}
+                        self.reply('250 ok')
+                    elif command == 'RCPT':
+                        envelope['rcpt'].append(line.split(':', 1)[1].strip(' <>'))
+                        self.reply('250 ok')
+                    elif command == 'DATA':
+                        if server.drop_after is not None and len(server.messages) >= server.drop_after:
+                            server.drop_after = None
+                            return
+                        self.reply('354 end with .')
+                        data = []
+                        while True:
+                            chunk = self.rfile.readline()
+                            if chunk in (b'.\r\n', b'.\n', b''):
+                                break
+                            data.append(chunk)
+                        if server.reject > 0:
+                            server.reject -= 1
+                            self.reply('451 try again later')
+                        else:
+                            server.messages.append({'to': envelope['rcpt'], 'data': b''.join(data).decode(errors='replace')})
+                            self.reply('250 queued')
+                    else:
+                        self.reply('250 ok')
+
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def smtp_server(app):
+    server = FakeSMTPServer()
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=server.port, MAIL_USE_TLS=False,
+                      MAIL_USE_SSL=False, MAIL_USERNAME=None, MAIL_PASSWORD=None, MAIL_SUPPRESS_SEND=False)
+    mail.init_app(app)
+    yield server
+    server.close()
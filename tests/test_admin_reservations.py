@@ -0,0 +1,63 @@
+import html
+import re
+from datetime import date, time, timedelta
+from app import db
+from app.models import Reservation
+
+
+def seed(count):
+    # Few distinct (date, time) pairs so pages split ties on id
+    rows = [{'date': date(2026, 1, 1) + timedelta(days=i % 3), 'time': time(19 + i % 2, 0), 'guests': 2,
+             'first_name': 'Client', 'last_name': f'N{i}', 'email': f'c{i}@example.com', 'phone': '0600000000',
+             'status': 'confirmed' if i % 2 else 'pending'} for i in range(count)]
+    db.session.execute(Reservation.__table__.insert(), rows)
+    db.session.commit()
+
+
+def row_ids(page):
+    return [int(i) for i in re.findall(r'<tr id="reservation-(\d+)"', page)]
+
+
+def next_url(page):
+    found = re.search(r'<tr hx-get="([^"]+)" hx-trigger="revealed"', page)
+    return html.unescape(found.group(1)) if found else None
+
+
+def walk(client, url):
+    page = client.get(url).get_data(as_text=True)
+    ids = row_ids(page)
+    while next_url(page):
+        page = client.get(next_url(page), headers={'HX-Request': 'true'}).get_data(as_text=True)
+        assert '<html' not in page
+        ids += row_ids(page)
+    return ids
+
+
+def test_infinite_scroll_walks_every_row_once_in_order(app, admin_client):
+    seed(70)
+    expected = [r.id for r in Reservation.query.order_by(
+        Reservation.date.desc(), Reservation.time.desc(), Reservation.id.desc())]
+
+    first = admin_client.get('/admin/reservations').get_data(as_text=True)
+    assert len(row_ids(first)) == app.config['ITEMS_PER_PAGE']
+    assert '70 réservations' in first
+    assert walk(admin_client, '/admin/reservations') == expected
+
+
+def test_filters_carry_over_to_next_pages(app, admin_client):
+    seed(70)
+    ids = walk(admin_client, '/admin/reservations?status=pending&date=2026-01-02')
+    expected = {r.id for r in Reservation.query.filter_by(status='pending', date=date(2026, 1, 2))}
+    assert len(ids) == len(expected) and set(ids) == expected
+
+
+def test_count_is_cached_per_filter(app, admin_client):
+    seed(3)
+    assert '3 réservations' in admin_client.get('/admin/reservations').get_data(as_text=True)
+    seed(1)
+    assert '3 réservations' in admin_client.get('/admin/reservations').get_data(as_text=True)
+    assert '1 réservation<' in admin_client.get('/admin/reservations?status=confirmed').get_data(as_text=True)
+
+
+def test_bad_cursor_is_rejected(app, admin_client):
+    assert admin_client.get('/admin/reservations?after=nope').status_code == 400
@@ -0,0 +1,56 @@
+import threading
+from datetime import date, timedelta
+import pytest
+from config import TestingConfig
+from app import create_app, db, limiter
+from app.models import Reservation, SlotOccupancy
+
+CAPACITY = 50
+ATTEMPTS = 200
+
+
+@pytest.fixture
+def file_app(tmp_path, monkeypatch):
+    # Threads need their own connections, which an in-memory database cannot share
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'admission.db'}", raising=False)
+    monkeypatch.setattr(TestingConfig, 'RATELIMIT_ENABLED', False, raising=False)
+    monkeypatch.setattr(TestingConfig, 'CAPACITY', CAPACITY, raising=False)
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+    limiter.enabled = True
+
+
+def test_concurrent_confirms_never_overbook(file_app):
+    day = date.today() + timedelta(days=10)
+    barrier = threading.Barrier(ATTEMPTS)
+    errors = []
+
+    def book(n):
+        client = file_app.test_client()
+        form = {'date': day.isoformat(), 'time': '20:00', 'guests': '2', 'first_name': f'Client{n}',
+                'last_name': 'Test', 'email': f'client{n}@example.com', 'phone': '0600000000'}
+        barrier.wait()
+        try:
+            resp = client.post('/reservation/confirm', data=form)
+            assert resp.status_code == 302
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=book, args=(n,)) for n in range(ATTEMPTS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    with file_app.app_context():
+        booked = db.session.query(db.func.sum(Reservation.guests)).filter_by(date=day).scalar()
+        assert booked == CAPACITY
+        peak = db.session.query(db.func.max(SlotOccupancy.covers)).filter_by(date=day).scalar()
+        assert peak == CAPACITY
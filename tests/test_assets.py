@@ -0,0 +1,83 @@
+import gzip
+import os
+import shutil
+import time
+from app.assets import Manifest, asset_url, build
+
+CSS = b'body { color: #0b3d91; }\n' * 200
+
+
+def use_static(app, folder):
+    app.static_folder = str(folder)
+    app.extensions['asset_manifest'] = Manifest(str(folder))
+
+
+def write_css(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'site.css').write_bytes(CSS)
+
+
+def test_fingerprinted_assets_are_immutable(app, client, tmp_path):
+    write_css(tmp_path)
+    use_static(app, tmp_path)
+    with app.test_request_context():
+        url = asset_url('css/site.css')
+    assert url.startswith('/static/css/site.') and url.endswith('.css') and url != '/static/css/site.css'
+
+    response = client.get(url)
+    assert response.status_code == 200 and response.data == CSS
+    assert response.mimetype == 'text/css'
+    assert response.cache_control.immutable and response.cache_control.max_age == 365 * 24 * 3600
+
+    # The plain name still works, without the long cache; stale fingerprints do not
+    assert not client.get('/static/css/site.css').cache_control.immutable
+    assert client.get('/static/css/site.000000000000.css').status_code == 404
+
+
+def test_precompressed_siblings(app, client, tmp_path):
+    write_css(tmp_path)
+    assert build(str(tmp_path), echo=lambda line: None) >= 1
+    use_static(app, tmp_path)
+    with app.test_request_context():
+        url = asset_url('css/site.css')
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.mimetype == 'text/css'
+    assert len(response.data) < len(CSS) and gzip.decompress(response.data) == CSS
+
+    response = client.get(url, headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers and response.data == CSS
+
+
+def test_stale_siblings_are_ignored(app, client, tmp_path):
+    write_css(tmp_path)
+    (tmp_path / 'css' / 'site.css.gz').write_bytes(gzip.compress(b'body { color: red; }'))
+    later = time.time() + 10
+    os.utime(tmp_path / 'css' / 'site.css', (later, later))
+    use_static(app, tmp_path)
+    assert app.extensions['asset_manifest'].encodings['css/site.css'] == []
+    response = client.get('/static/css/site.css', headers={'Accept-Encoding': 'gzip'})
+    # Compressed on the fly from the current file instead
+    assert gzip.decompress(response.data) == CSS
+
+
+def test_pages_link_fingerprinted_css(app, client):
+    html = client.get('/').get_data(as_text=True)
+    assert app.extensions['asset_manifest'].urls['css/output.css'] in html
+
+
+def test_rebuilt_assets_change_page_tags(app, client, tmp_path):
+    static = tmp_path / 'static'
+    shutil.copytree(app.static_folder, static, ignore=shutil.ignore_patterns('uploads'))
+    use_static(app, static)
+    first = client.get('/')
+
+    # Redeploy with a rebuilt stylesheet and the same templates
+    (static / 'css' / 'output.css').write_bytes(CSS)
+    use_static(app, static)
+    again = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 200
+    assert again.headers['ETag'] != first.headers['ETag']
+    assert app.extensions['asset_manifest'].urls['css/output.css'] in again.get_data(as_text=True)
@@ -0,0 +1,92 @@
+import gzip
+import zlib
+from flask import Response
+from app import compression, db
+from app.models import Category, MenuItem
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+def add_routes(app):
+    app.add_url_rule('/tiny', 'tiny', lambda: Response('ok', mimetype='text/plain'))
+
+    def streamed():
+        return Response((f'{i:04d}'.encode() * 250 for i in range(3)), mimetype='text/plain')
+    app.add_url_rule('/streamed', 'streamed', streamed)
+
+
+def setup_menu():
+    plats = Category(name='Plats', slug='plats')
+    db.session.add(plats)
+    db.session.flush()
+    for i in range(10):
+        db.session.add(MenuItem(name=f'Yassa {i}', category_id=plats.id, price=15, description='Poulet mariné', order=i))
+    db.session.commit()
+
+
+def test_pages_are_compressed(app, client):
+    plain = client.get('/')
+    response = client.get('/', headers=GZIP)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert int(response.headers['Content-Length']) == len(response.data) < len(plain.data)
+    assert gzip.decompress(response.data) == plain.data
+
+
+def test_not_modified_carries_the_negotiated_validators(app, client):
+    setup_menu()
+    for url in ('/', '/menu', '/static/css/output.css', '/api/menu/filter?category=plats'):
+        first = client.get(url, headers=GZIP)
+        assert first.headers['ETag'].startswith('W/')
+        revalidated = client.get(url, headers={**GZIP, 'If-None-Match': first.headers['ETag']})
+        assert revalidated.status_code == 304
+        assert revalidated.headers['ETag'] == first.headers['ETag']
+        assert 'Accept-Encoding' in revalidated.headers['Vary']
+
+    # Without a negotiated encoding both keep the strong tag
+    first = client.get('/')
+    assert not first.headers['ETag'].startswith('W/')
+    revalidated = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 304 and revalidated.headers['ETag'] == first.headers['ETag']
+
+
+def test_small_and_unaccepted_responses_are_left_alone(app, client):
+    add_routes(app)
+    response = client.get('/tiny', headers=GZIP)
+    assert 'Content-Encoding' not in response.headers and response.data == b'ok'
+    assert 'Content-Encoding' not in client.get('/').headers
+    assert 'Content-Encoding' not in client.get('/', headers={'Accept-Encoding': 'identity'}).headers
+
+
+def test_streamed_responses_are_flushed_per_chunk(app, client):
+    add_routes(app)
+    response = client.get('/streamed', headers=GZIP, buffered=False)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+
+    decoder = zlib.decompressobj(31)
+    parts = [decoder.decompress(chunk) for chunk in response.response]
+    response.close()
+    # Each application chunk can be decoded as soon as it arrives
+    assert parts[:3] == [f'{i:04d}'.encode() * 250 for i in range(3)]
+    assert b''.join(parts) + decoder.flush() == b''.join(f'{i:04d}'.encode() * 250 for i in range(3))
+
+
+def test_cached_fragment_is_not_recompressed(app, client, monkeypatch):
+    setup_menu()
+    calls = []
+    compress = compression.compress
+    monkeypatch.setattr(compression, 'compress', lambda *args: calls.append(args[1]) or compress(*args))
+
+    first = client.get('/api/menu/filter?category=plats', headers=GZIP)
+    assert first.headers['Content-Encoding'] == 'gzip' and calls
+    assert first.headers['ETag'].startswith('W/')
+
+    calls.clear()
+    second = client.get('/api/menu/filter?category=plats', headers=GZIP)
+    assert second.data == first.data and calls == []
+    assert b'Yassa 9' in gzip.decompress(second.data)
+
+    revalidated = client.get('/api/menu/filter?category=plats',
+                             headers={**GZIP, 'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 304
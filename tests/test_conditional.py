@@ -0,0 +1,51 @@
+from app.menu import bump_menu_version
+from app.models import Settings
+
+
+def revalidate(client, url, response):
+    return client.get(url, headers={'If-None-Match': response.headers['ETag']})
+
+
+def test_pages_answer_304_until_settings_change(app, client):
+    for url in ('/', '/menu', '/api/menu/filter', '/sitemap.xml', '/robots.txt'):
+        first = client.get(url)
+        assert first.status_code == 200
+        assert first.headers['ETag']
+        again = revalidate(client, url, first)
+        assert again.status_code == 304
+        assert again.data == b''
+
+    first = client.get('/')
+    Settings.set('ADDRESS', '1 Rue du Lagon')
+    changed = revalidate(client, '/', first)
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
+    assert b'1 Rue du Lagon' in changed.data
+
+
+def test_menu_edit_changes_fragment_tag(app, client):
+    first = client.get('/api/menu/filter?category=all')
+    page = client.get('/')
+    version = Settings.version()
+    bump_menu_version()
+    assert revalidate(client, '/api/menu/filter?category=all', first).status_code == 200
+    # Settings and the pages tagged with them are left alone
+    assert Settings.version() == version
+    assert revalidate(client, '/', page).status_code == 304
+
+
+def test_last_modified_revalidation(app, client):
+    Settings.set('PHONE', '0102030405')
+    first = client.get('/menu')
+    assert first.last_modified is not None
+    again = client.get('/menu', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert again.status_code == 304
+
+
+def test_flashed_pages_are_not_tagged(app, client):
+    with client.session_transaction() as session:
+        session['_flashes'] = [('success', 'Réservation confirmée')]
+    resp = client.get('/', headers={'If-None-Match': '*'})
+    assert resp.status_code == 200
+    assert 'ETag' not in resp.headers
+    assert 'no-store' in resp.headers['Cache-Control']
@@ -0,0 +1,55 @@
+from datetime import date, time, timedelta
+from sqlalchemy import event
+from app import db
+from app.models import Reservation, Settings
+from app.stats import dashboard_stats
+
+
+def book(day, guests, status='confirmed'):
+    db.session.add(Reservation(date=day, time=time(20, 0), guests=guests, first_name='A', last_name='B',
+                               email='a@example.com', phone='0600000000', status=status))
+
+
+def test_stats_in_one_query(app):
+    today = date.today()
+    Settings.set('CAPACITY', 40)
+    book(today, 4)
+    book(today, 6)
+    book(today, 8, status='cancelled')
+    book(today - timedelta(days=2), 2)
+    book(today - timedelta(days=40), 2)
+    db.session.commit()
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        stats = dashboard_stats(90)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    # Served from the daily_stats rollup, whatever the range
+    assert not [s for s in statements if 'FROM reservations' in s]
+    assert len([s for s in statements if 'FROM daily_stats' in s]) == 1
+    assert len(stats['values']) == 90
+    assert stats['values'][-1] == 3 and stats['values'][-3] == 1 and stats['values'][-41] == 1
+    assert stats['covers'][-1] == 10
+    assert stats['today_count'] == 3
+    assert stats['capacity'] == 40
+    assert stats['fill_rate'] == 25.0
+
+
+def test_stats_are_cached(app):
+    book(date.today(), 2)
+    db.session.commit()
+    assert dashboard_stats(7)['today_count'] == 1
+    book(date.today(), 2)
+    db.session.commit()
+    assert dashboard_stats(7)['today_count'] == 1
+
+
+def test_dashboard_ranges(app, admin_client):
+    assert '(30 derniers jours)' in admin_client.get('/admin/dashboard?range=30').get_data(as_text=True)
+    assert '(7 derniers jours)' in admin_client.get('/admin/dashboard?range=12').get_data(as_text=True)
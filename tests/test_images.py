@@ -0,0 +1,178 @@
+import io
+import json
+import os
+from PIL import Image, features
+from app import db
+from app import images
+from app.images import HASHED_NAME
+from app.models import Category, MenuItem
+
+
+def add_category():
+    category = Category(name='Plats', slug='plats')
+    db.session.add(category)
+    db.session.commit()
+    return category.id
+
+
+def photo(width, height, fmt='JPEG'):
+    image = Image.new('RGB', (width, height), (200, 120, 40))
+    exif = image.getexif()
+    exif[0x010f] = 'SecretCamera'
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, exif=exif)
+    buffer.seek(0)
+    return buffer
+
+
+def add_item(client, category_id, upload, name='Yassa'):
+    return client.post('/admin/menu/add', content_type='multipart/form-data', data={
+        'name': name, 'category_id': str(category_id), 'description': '', 'price': '14.00',
+        'is_available': 'true', 'image_file': (upload, 'photo.jpg'),
+    })
+
+
+def test_upload_writes_metadata_free_variants(app, admin_client):
+    category_id = add_category()
+    response = add_item(admin_client, category_id, photo(2000, 1500))
+    assert response.status_code == 200
+
+    item = MenuItem.query.filter_by(name='Yassa').one()
+    variants = json.loads(item.image_variants)
+    formats = ['avif', 'webp'] if features.check('avif') else ['webp']
+    assert sorted(variants) == sorted(formats)
+    for fmt in formats:
+        assert [width for width, _ in variants[fmt]] == [320, 640, 1280]
+    assert item.image_url.endswith('-1280.webp')
+
+    folder = app.config['UPLOAD_FOLDER']
+    for _, path in variants['webp']:
+        name = os.path.join(folder, os.path.basename(path))
+        with Image.open(name) as image:
+            assert image.format == 'WEBP'
+            assert 'exif' not in image.info
+        with open(name, 'rb') as f:
+            assert b'SecretCamera' not in f.read()
+    # Only the variants are kept, not the original upload
+    assert len(os.listdir(folder)) == 3 * len(formats)
+
+    html = response.get_data(as_text=True)
+    assert '-320.webp 320w' in html and '-1280.webp 1280w' in html
+    if 'avif' in formats:
+        assert '<source type="image/avif"' in html
+
+
+def test_small_images_are_not_upscaled(app, admin_client):
+    category_id = add_category()
+    add_item(admin_client, category_id, photo(200, 150, fmt='PNG'))
+    variants = json.loads(MenuItem.query.one().image_variants)
+    assert [width for width, _ in variants['webp']] == [200]
+
+
+def test_jpeg_fallback_without_modern_encoders(app, admin_client, monkeypatch):
+    monkeypatch.setattr(features, 'check', lambda feature: False)
+    category_id = add_category()
+    upload = io.BytesIO()
+    Image.new('RGBA', (400, 300), (200, 120, 40, 128)).save(upload, format='PNG')
+    upload.seek(0)
+    response = add_item(admin_client, category_id, upload)
+    assert response.status_code == 200
+
+    item = MenuItem.query.one()
+    assert list(json.loads(item.image_variants)) == ['jpeg']
+    assert item.image_url.endswith('-400.jpeg')
+    with Image.open(os.path.join(app.config['UPLOAD_FOLDER'], item.image_url.rsplit('/', 1)[1])) as image:
+        assert image.format == 'JPEG'
+    # The <img> lists the JPEG variants, with no <source> for formats that were not written
+    html = response.get_data(as_text=True)
+    assert '-400.jpeg 400w' in html and '<source' not in html
+
+
+def test_undecodable_upload_is_dropped(app, admin_client):
+    category_id = add_category()
+    response = add_item(admin_client, category_id, io.BytesIO(b'not an image'))
+    assert response.status_code == 200
+    item = MenuItem.query.one()
+    assert item.image_url is None and item.image_variants is None
+    assert os.listdir(app.config['UPLOAD_FOLDER']) == []
+
+
+def test_upload_in_process_pool(app, admin_client):
+    app.config['IMAGE_WORKERS'] = 1
+    category_id = add_category()
+    add_item(admin_client, category_id, photo(800, 600))
+    variants = json.loads(MenuItem.query.one().image_variants)
+    assert [width for width, _ in variants['webp']] == [320, 640, 800]
+
+
+def crash(*args):
+    # Stands in for render_variants in the pool: the worker dies as if OOM-killed
+    os._exit(1)
+
+
+def test_upload_after_a_worker_died(app, admin_client, monkeypatch):
+    app.config['IMAGE_WORKERS'] = 1
+    category_id = add_category()
+    monkeypatch.setattr(images, 'render_variants', crash)
+    response = add_item(admin_client, category_id, photo(800, 600), name='Yassa')
+    assert response.status_code == 200
+    assert MenuItem.query.filter_by(name='Yassa').one().image_variants is None
+
+    monkeypatch.undo()
+    response = add_item(admin_client, category_id, photo(800, 600), name='Yassa poisson')
+    assert response.status_code == 200
+    variants = json.loads(MenuItem.query.filter_by(name='Yassa poisson').one().image_variants)
+    assert [width for width, _ in variants['webp']] == [320, 640, 800]
+
+
+def test_same_photo_is_stored_once(app, admin_client):
+    category_id = add_category()
+    add_item(admin_client, category_id, photo(900, 600), name='Yassa')
+    files = sorted(os.listdir(app.config['UPLOAD_FOLDER']))
+    add_item(admin_client, category_id, photo(900, 600), name='Yassa poisson')
+
+    first, second = MenuItem.query.order_by(MenuItem.id).all()
+    assert first.image_variants == second.image_variants
+    assert sorted(os.listdir(app.config['UPLOAD_FOLDER'])) == files
+    assert all(HASHED_NAME.match(name) for name in files)
+
+
+def test_hashed_uploads_are_immutable(app, admin_client, tmp_path):
+    app.static_folder = str(tmp_path)
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    os.mkdir(app.config['UPLOAD_FOLDER'])
+    (tmp_path / 'uploads' / '1766139608_yassa-poulet.webp').write_bytes(b'legacy')
+    category_id = add_category()
+    add_item(admin_client, category_id, photo(400, 300))
+
+    response = admin_client.get(MenuItem.query.one().image_url)
+    assert response.status_code == 200
+    assert response.cache_control.immutable and response.cache_control.max_age == 365 * 24 * 3600
+    # Timestamped names from before content addressing are left alone
+    response = admin_client.get('/static/uploads/1766139608_yassa-poulet.webp')
+    assert not response.cache_control.immutable
+
+
+def test_gc_removes_unreferenced_uploads(app, admin_client, runner):
+    category_id = add_category()
+    folder = app.config['UPLOAD_FOLDER']
+    add_item(admin_client, category_id, photo(400, 300), name='Kept')
+    kept = set(os.listdir(folder))
+    add_item(admin_client, category_id, photo(500, 300), name='Gone')
+    gone = set(os.listdir(folder)) - kept | {'1766140167_yassa-poulet.webp'}
+    db.session.delete(MenuItem.query.filter_by(name='Gone').one())
+    db.session.commit()
+    for name in ('.gitkeep', '1766140167_yassa-poulet.webp'):
+        open(os.path.join(folder, name), 'wb').close()
+
+    # Recent files are spared by default
+    result = runner.invoke(args=['gc-uploads'])
+    assert '0 unreferenced upload(s) removed.' in result.output
+
+    result = runner.invoke(args=['gc-uploads', '--grace-hours', '0', '--dry-run'])
+    assert f'{len(gone)} unreferenced upload(s) found.' in result.output
+    assert set(os.listdir(folder)) == kept | gone | {'.gitkeep'}
+
+    result = runner.invoke(args=['gc-uploads', '--grace-hours', '0'])
+    assert f'{len(gone)} unreferenced upload(s) removed.' in result.output
+    assert set(os.listdir(folder)) == kept | {'.gitkeep'}
@@ -0,0 +1,41 @@
+from datetime import date
+from app import db
+from app.models import Category, MenuItem, Reservation, SlotOccupancy
+
+
+def query_plan(query):
+    """Return SQLite's EXPLAIN QUERY PLAN details for an ORM query."""
+    sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+
+def test_reservation_queries_use_indexes(app):
+    today = date.today()
+
+    plan = query_plan(Reservation.query.filter(Reservation.date == today, Reservation.status != 'cancelled'))
+    assert 'USING INDEX ix_reservations_date_status' in plan or 'USING COVERING INDEX ix_reservations_date_status' in plan
+
+    plan = query_plan(Reservation.query.filter_by(status='pending').order_by(Reservation.date.desc(), Reservation.time.desc()))
+    assert 'ix_reservations_status_date_time' in plan
+    assert 'TEMP B-TREE' not in plan
+
+    plan = query_plan(Reservation.query.order_by(Reservation.created_at.desc()).limit(10))
+    assert 'ix_reservations_created_at' in plan
+
+    plan = query_plan(SlotOccupancy.query.filter(SlotOccupancy.date == today))
+    assert 'USING INDEX' in plan or 'USING PRIMARY KEY' in plan
+
+
+def test_menu_queries_use_indexes(app):
+    plan = query_plan(MenuItem.query.filter_by(is_available=True).order_by(MenuItem.order))
+    assert 'ix_menu_items_available_category_order' in plan
+
+    plan = query_plan(MenuItem.query.filter_by(is_available=True).join(Category)
+                      .filter(Category.slug == 'plats').order_by(MenuItem.order))
+    assert 'ix_menu_items_available_category_order' in plan
+    assert 'sqlite_autoindex_categories' in plan
+
+    plan = query_plan(MenuItem.query.filter_by(category_id=1).order_by(MenuItem.order))
+    assert 'ix_menu_items_category_order' in plan
+    assert 'TEMP B-TREE' not in plan
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+from app import db
+from app.leader import FileLock, LeaseLock, SchedulerLeader, running_cli_command
+from app.models import SchedulerLease
+
+
+class RecordingScheduler:
+    running = False
+
+    def __init__(self):
+        self.calls = []
+
+    def start(self):
+        self.running = True
+        self.calls.append('start')
+
+    def pause(self):
+        self.calls.append('pause')
+
+    def resume(self):
+        self.calls.append('resume')
+
+
+def test_single_lease_holder_and_failover(app):
+    first = LeaseLock('worker-1', lease_seconds=30)
+    second = LeaseLock('worker-2', lease_seconds=30)
+
+    assert first.acquire()
+    assert not second.acquire()
+    assert first.renew()
+
+    # The leader stops renewing: once its lease expires the other worker takes over
+    SchedulerLease.query.update({'expires_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+    assert second.acquire()
+    assert not first.renew()
+    assert SchedulerLease.query.one().owner == 'worker-2'
+
+
+def test_release_hands_over_immediately(app):
+    first = LeaseLock('worker-1', lease_seconds=30)
+    second = LeaseLock('worker-2', lease_seconds=30)
+    first.acquire()
+    first.release()
+    assert second.acquire()
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / 'scheduler.lock')
+    first, second = FileLock(path), FileLock(path)
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_only_the_leader_runs_the_scheduler(app):
+    leader = SchedulerLeader(app, RecordingScheduler(), LeaseLock('worker-1', lease_seconds=30))
+    follower = SchedulerLeader(app, RecordingScheduler(), LeaseLock('worker-2', lease_seconds=30))
+
+    assert leader.step()
+    assert not follower.step()
+    assert leader.scheduler.calls == ['start']
+    assert follower.scheduler.calls == []
+
+    SchedulerLease.query.update({'expires_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+    assert follower.step()
+    assert not leader.step()
+    assert follower.scheduler.calls == ['start']
+    assert leader.scheduler.calls == ['start', 'pause']
+
+    follower.stop()
+    assert leader.step()
+    assert leader.scheduler.calls == ['start', 'pause', 'resume']
+
+
+def test_cli_commands_skip_the_scheduler(app, runner):
+    seen = []
+
+    @app.cli.command('probe')
+    def probe():
+        seen.append(running_cli_command())
+
+    runner.invoke(args=['probe'])
+    assert seen == [True]
+    assert not running_cli_command()
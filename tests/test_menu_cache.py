@@ -0,0 +1,94 @@
+from sqlalchemy import event
+from app import db
+from app.menu import bump_menu_version, menu_snapshot, menu_version
+from app.models import Category, MenuItem
+
+
+def setup_menu():
+    plats = Category(name='Plats', slug='plats')
+    db.session.add(plats)
+    db.session.flush()
+    db.session.add_all([
+        MenuItem(name='Yassa Poulet', category_id=plats.id, price=15, dietary_tags='', order=1),
+        MenuItem(name='Mafé Légumes', category_id=plats.id, price=13, dietary_tags='vegetarian', order=2),
+    ])
+    db.session.commit()
+
+
+def menu_queries(fn):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if 'FROM menu_items' in statement:
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        result = fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return result, len(statements)
+
+
+def test_filter_fragment_is_cached(app, client):
+    setup_menu()
+    first, queries = menu_queries(lambda: client.get('/api/menu/filter?category=plats&vegetarian=true'))
+    assert 'Mafé' in first.get_data(as_text=True) and b'Yassa' not in first.data
+    assert queries == 1
+
+    second, queries = menu_queries(lambda: client.get('/api/menu/filter?category=plats&vegetarian=true'))
+    assert second.data == first.data
+    assert queries == 0
+
+
+def test_admin_mutations_bump_menu_version(app, admin_client):
+    setup_menu()
+    assert b'Yassa' in admin_client.get('/api/menu/filter?q=yassa').data
+
+    version = menu_version()
+    item = MenuItem.query.filter_by(name='Yassa Poulet').first()
+    admin_client.post(f'/admin/menu/{item.id}/toggle')
+    assert menu_version() != version
+    assert b'Yassa' not in admin_client.get('/api/menu/filter?q=yassa').data
+
+    version = menu_version()
+    admin_client.post('/admin/menu/reorder', json={'items': [str(i.id) for i in MenuItem.query.all()]})
+    assert menu_version() != version
+
+
+def test_snapshot_filters_in_memory_and_follows_version(app):
+    setup_menu()
+    snapshot = menu_snapshot()
+    assert [e.name for e in snapshot.filter('plats')] == ['Yassa Poulet', 'Mafé Légumes']
+    assert [e.name for e in snapshot.filter('all', 'mafé')] == ['Mafé Légumes']
+    assert [e.name for e in snapshot.filter('all', vegetarian=True)] == ['Mafé Légumes']
+    assert snapshot.filter('desserts') == []
+    assert menu_snapshot() is snapshot
+
+    bump_menu_version()
+    assert menu_snapshot() is not snapshot
+
+
+def test_search_is_accent_insensitive_prefix_and_ranked(app, client):
+    setup_menu()
+    plats = Category.query.filter_by(slug='plats').first()
+    db.session.add_all([
+        MenuItem(name='Tiébou Dieune', category_id=plats.id, price=17, order=3,
+                 description='Riz au poisson, légumes'),
+        MenuItem(name='Accras', category_id=plats.id, price=8, order=4,
+                 description='Beignets de poisson', allergens='Gluten'),
+    ])
+    db.session.commit()
+    bump_menu_version()
+    index = menu_snapshot().index
+
+    assert [e.name for e in index.search('tiebou')] == ['Tiébou Dieune']
+    assert [e.name for e in index.search('thiebou')] == ['Tiébou Dieune']
+    assert [e.name for e in index.search('yas')] == ['Yassa Poulet']
+    assert [e.name for e in index.search('POISSON')] == ['Tiébou Dieune', 'Accras']
+    assert [e.name for e in index.search('gluten')] == ['Accras']
+    assert index.search('poisson riz') == index.search('riz poisson')[:1]
+    assert index.search('pizza') == []
+
+    resp = client.get('/api/menu/filter?q=Thi%C3%A9bou')
+    assert 'Tiébou Dieune' in resp.get_data(as_text=True)
@@ -12,6 +12,7 @@ def test_menu_crud_flow(app, client):
         cat = Category(name='Test', slug='test')
         db.session.add(cat)
         db.session.commit()
+        cat_id = cat.id
 
     # Login
     resp = client.post('/admin/login', data={'email': 'admin@example.com', 'password': 'secret'}, follow_redirects=True)
@@ -20,7 +21,7 @@ def test_menu_crud_flow(app, client):
     # Add menu item with file upload
     data = {
         'name': 'Test Dish',
-        'category_id': str(cat.id),
+        'category_id': str(cat_id),
         'description': 'A test dish',
         'price': '12.50',
         'is_available': 'true'
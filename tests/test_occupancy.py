@@ -0,0 +1,135 @@
+from datetime import date, time, timedelta
+from app import db
+from app.models import Reservation, SlotOccupancy
+from app.occupancy import DayOccupancy, bucket_span, track_change
+
+
+def make_reservation(day, at, guests, status='confirmed'):
+    reservation = Reservation(date=day, time=at, guests=guests, first_name='Awa', last_name='Diop',
+                              email='awa@example.com', phone='0600000000', status=status)
+    db.session.add(reservation)
+    track_change(None, reservation)
+    return reservation
+
+
+def stored_covers(day):
+    return {row.bucket: row.covers for row in SlotOccupancy.query.filter_by(date=day)}
+
+
+def next_open_day():
+    day = date.today() + timedelta(days=7)
+    while day.weekday() == 0:
+        day += timedelta(days=1)
+    return day
+
+
+def test_bucket_span_rounds_outwards():
+    assert bucket_span(time(12, 0), 120) == (48, 56)
+    assert bucket_span(time(12, 10), 120) == (48, 57)
+
+
+def test_peak_counts_concurrent_covers_only():
+    occupancy = DayOccupancy(120)
+    occupancy.add(time(12, 0), 10)
+    occupancy.add(time(14, 0), 20)
+
+    # Back-to-back sittings never share a bucket
+    assert occupancy.peak(time(12, 0)) == 10
+    assert occupancy.peak(time(13, 0)) == 20
+    assert occupancy.peak(time(14, 0), 60) == 20
+    assert occupancy.peak(time(16, 0)) == 0
+    assert occupancy.fits(time(13, 0), 30, 50)
+    assert not occupancy.fits(time(13, 0), 31, 50)
+
+    occupancy.remove(time(14, 0), 20)
+    assert occupancy.peak(time(13, 0)) == 10
+
+
+def test_peak_matches_brute_force():
+    occupancy = DayOccupancy(120)
+    bookings = [(time(h, m), g) for h, m, g in [(12, 0, 4), (12, 30, 6), (13, 0, 2), (19, 0, 8), (20, 30, 5), (22, 0, 3)]]
+    for at, guests in bookings:
+        occupancy.add(at, guests)
+
+    covers = occupancy.covers
+    for hour in range(11, 24):
+        for minute in (0, 15, 30, 45):
+            first, last = bucket_span(time(hour, minute), 120)
+            assert occupancy.peak(time(hour, minute)) == max(covers[first:last])
+
+
+def test_check_availability_hides_full_slots(app, client):
+    day = next_open_day()
+    make_reservation(day, time(19, 0), 48)
+    make_reservation(day, time(12, 0), 48, status='cancelled')
+    db.session.commit()
+
+    resp = client.post('/api/check-availability', data={'date': day.isoformat(), 'guests': '4'})
+    assert resp.status_code == 200
+    # 19:00 booking seats until 21:00, so 17:30-20:30 starts overlap it
+    assert b'value="20:30"' not in resp.data
+    assert b'value="21:00"' in resp.data
+    # Cancelled bookings free their seats
+    assert b'value="12:00"' in resp.data
+
+
+def test_confirm_rejects_overbooking(app, client):
+    day = next_open_day()
+    make_reservation(day, time(19, 0), 48)
+    db.session.commit()
+
+    form = {'date': day.isoformat(), 'time': '20:00', 'guests': '4', 'first_name': 'Moussa',
+            'last_name': 'Ba', 'email': 'moussa@example.com', 'phone': '0611111111'}
+    client.post('/reservation/confirm', data=form)
+    assert Reservation.query.filter_by(email='moussa@example.com').count() == 0
+
+    form['time'] = '21:00'
+    client.post('/reservation/confirm', data=form)
+    assert Reservation.query.filter_by(email='moussa@example.com').count() == 1
+
+
+def test_admin_changes_keep_occupancy_in_sync(app, admin_client):
+    day = next_open_day()
+    reservation = make_reservation(day, time(19, 0), 6)
+    db.session.commit()
+    assert stored_covers(day) == {b: 6 for b in range(*bucket_span(time(19, 0), 120))}
+
+    admin_client.post(f'/admin/reservations/{reservation.id}/edit', data={
+        'date': day.isoformat(), 'time': '20:00', 'guests': '8', 'status': 'confirmed', 'internal_notes': ''})
+    assert stored_covers(day) == {b: 8 for b in range(*bucket_span(time(20, 0), 120))}
+
+    admin_client.post(f'/admin/reservations/{reservation.id}/status', data={'status': 'cancelled'})
+    assert stored_covers(day) == {}
+
+    admin_client.post(f'/admin/reservations/{reservation.id}/confirm')
+    assert stored_covers(day) == {b: 8 for b in range(*bucket_span(time(20, 0), 120))}
+
+
+def test_rebuild_command_repairs_drift(app, runner):
+    day = next_open_day()
+    make_reservation(day, time(12, 0), 4)
+    db.session.add(Reservation(date=day, time=time(12, 30), guests=2, first_name='Fatou', last_name='Sall',
+                               email='fatou@example.com', phone='0622222222', status='confirmed'))
+    db.session.commit()
+
+    result = runner.invoke(args=['rebuild-occupancy'])
+    assert f'drift corrected for {day.isoformat()}' in result.output
+    assert DayOccupancy.for_date(day, 120).covers == DayOccupancy.from_reservations(day, 120).covers
+
+    result = runner.invoke(args=['rebuild-occupancy', '--date', day.isoformat()])
+    assert '0 date(s) out of sync' in result.output
+
+
+def test_untracked_cancellation_rebuilds_the_day(app, admin_client):
+    day = next_open_day()
+    make_reservation(day, time(12, 0), 4)
+    # Booked before slot_occupancy existed: never counted
+    untracked = Reservation(date=day, time=time(12, 30), guests=6, first_name='Fatou', last_name='Sall',
+                            email='fatou@example.com', phone='0622222222', status='confirmed')
+    db.session.add(untracked)
+    db.session.commit()
+
+    admin_client.post(f'/admin/reservations/{untracked.id}/status', data={'status': 'cancelled'})
+    covers = stored_covers(day)
+    assert min(covers.values()) > 0
+    assert DayOccupancy.for_date(day, 120).covers == DayOccupancy.from_reservations(day, 120).covers
@@ -0,0 +1,109 @@
+import time
+from datetime import date, datetime, timedelta
+from app import db
+from app.models import OutboundEmail, Settings
+from app.outbox import deliver_pending, enqueue_email
+
+
+def booking_form():
+    day = date.today() + timedelta(days=10)
+    return {'date': day.isoformat(), 'time': '20:00', 'guests': '2', 'first_name': 'Awa',
+            'last_name': 'Diop', 'email': 'awa@example.com', 'phone': '0600000000'}
+
+
+def test_booking_queues_email_without_touching_smtp(app, client):
+    # Nothing listens here: a synchronous send would fail or hang on connect
+    app.config.update(MAIL_SERVER='10.255.255.1', MAIL_PORT=25, MAIL_SUPPRESS_SEND=False)
+    started = time.perf_counter()
+    resp = client.post('/reservation/confirm', data=booking_form())
+    assert resp.status_code == 302
+    assert time.perf_counter() - started < 1
+
+    queued = OutboundEmail.query.one()
+    assert queued.status == 'pending'
+    assert queued.recipients == 'awa@example.com'
+    assert 'Votre réservation' in queued.body
+
+
+def test_contact_form_queues_notification(app, client):
+    Settings.set('CONTACT_EMAIL', 'contact@lelagon.com')
+    client.post('/contact', data={'name': 'Moussa', 'email': 'moussa@example.com',
+                                  'message': 'Avez-vous une terrasse ?'})
+    queued = OutboundEmail.query.one()
+    assert queued.sender == 'moussa@example.com'
+    assert queued.recipients == 'contact@lelagon.com'
+
+
+def test_outbox_delivers_over_one_connection(app, client, smtp_server):
+    client.post('/reservation/confirm', data=booking_form())
+    enqueue_email('Hello', ['chef@lelagon.com'], 'Bonjour')
+
+    assert deliver_pending() == (2, 0)
+    assert smtp_server.connections == 1
+    assert [m['to'] for m in smtp_server.messages] == [['awa@example.com'], ['chef@lelagon.com']]
+    assert OutboundEmail.query.filter_by(status='sent').count() == 2
+    assert deliver_pending() == (0, 0)
+
+
+def test_outbox_retries_with_backoff_then_gives_up(app, smtp_server):
+    app.config.update(OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_BASE_SECONDS=60)
+    email = enqueue_email('Hello', ['chef@lelagon.com'], 'Bonjour')
+
+    smtp_server.reject = 1
+    assert deliver_pending() == (0, 1)
+    assert email.attempts == 1 and email.status == 'pending'
+    assert email.next_attempt_at > datetime.utcnow() + timedelta(seconds=55)
+    assert deliver_pending() == (0, 0)  # not due yet
+
+    email.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    assert deliver_pending() == (1, 0)
+    assert email.status == 'sent' and smtp_server.messages
+
+    # Unreachable server: each pass counts as an attempt until the message fails
+    failing = enqueue_email('Hello', ['chef@lelagon.com'], 'Bonjour')
+    smtp_server.close()
+    for _ in range(3):
+        failing.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        deliver_pending()
+    assert failing.status == 'failed' and failing.attempts == 3
+
+
+def test_confirmation_is_committed_with_the_booking(app, client):
+    Settings.set('CAPACITY', '2')
+    client.post('/reservation/confirm', data=booking_form())
+    assert OutboundEmail.query.count() == 1
+
+    # Full slot: neither a booking nor a confirmation
+    client.post('/reservation/confirm', data={**booking_form(), 'email': 'moussa@example.com'})
+    assert OutboundEmail.query.count() == 1
+    assert OutboundEmail.query.one().recipients == 'awa@example.com'
+
+
+def test_claimed_messages_are_not_sent_twice(app, smtp_server):
+    email = enqueue_email('Hello', ['chef@lelagon.com'], 'Bonjour')
+    # Claimed by a pass running elsewhere
+    email.claimed_at = datetime.utcnow()
+    db.session.commit()
+    assert deliver_pending() == (0, 0)
+    assert smtp_server.messages == []
+
+    # That pass crashed: its claim expires
+    email.claimed_at = datetime.utcnow() - timedelta(seconds=app.config['OUTBOX_CLAIM_SECONDS'] + 1)
+    db.session.commit()
+    assert deliver_pending() == (1, 0)
+    assert email.status == 'sent' and email.claimed_at is None
+
+
+def test_dropped_connection_releases_the_rest_of_the_batch(app, smtp_server):
+    emails = [enqueue_email(f'Hello {i}', ['chef@lelagon.com'], 'Bonjour') for i in range(3)]
+    smtp_server.drop_after = 1
+    assert deliver_pending() == (1, 0)
+    # Not counted against the messages: no attempt used, no backoff, no claim left
+    for email in emails[1:]:
+        assert email.status == 'pending' and email.attempts == 0
+        assert email.claimed_at is None and email.next_attempt_at <= datetime.utcnow()
+
+    assert deliver_pending() == (2, 0)
+    assert len(smtp_server.messages) == 3
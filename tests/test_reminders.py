@@ -0,0 +1,91 @@
+from datetime import date, datetime, time, timedelta
+from app import db
+from app.models import Reservation
+from app.tasks import send_reminders
+
+
+def book_tomorrow(count, status='confirmed'):
+    day = date.today() + timedelta(days=1)
+    for i in range(count):
+        db.session.add(Reservation(date=day, time=time(20, 0), guests=2, first_name=f'Client{i}',
+                                   last_name='Test', email=f'client{i}@example.com',
+                                   phone='0600000000', status=status))
+    db.session.commit()
+
+
+def test_reminders_share_a_bounded_connection_pool(app, smtp_server):
+    app.config['MAIL_POOL_SIZE'] = 3
+    book_tomorrow(30)
+    book_tomorrow(2, status='cancelled')
+
+    report = send_reminders()
+
+    assert len(report.sent) == 30
+    assert not report.failed
+    assert len(smtp_server.messages) == 30
+    assert smtp_server.connections <= 3
+    assert sorted(m['to'][0] for m in smtp_server.messages) == sorted(f'client{i}@example.com' for i in range(30))
+
+
+def test_refused_reminders_are_reported_and_connection_kept(app, smtp_server):
+    app.config['MAIL_POOL_SIZE'] = 1
+    book_tomorrow(5)
+    smtp_server.reject = 2
+
+    report = send_reminders()
+
+    assert len(report.failed) == 2
+    assert len(report.sent) == 3
+    assert set(report.failed) | set(report.sent) == {r.id for r in Reservation.query}
+    assert smtp_server.connections == 1
+
+
+def test_rerun_does_not_resend(app, smtp_server):
+    book_tomorrow(4)
+    send_reminders()
+    report = send_reminders()
+
+    assert report.sent == [] and not report.failed
+    assert len(smtp_server.messages) == 4
+    assert all(r.reminder_sent_at for r in Reservation.query)
+
+
+def test_failed_reminders_are_retried_on_next_run(app, smtp_server):
+    app.config['MAIL_POOL_SIZE'] = 1
+    book_tomorrow(3)
+    smtp_server.reject = 1
+    first = send_reminders()
+    second = send_reminders()
+
+    assert list(first.failed) == second.sent
+    assert len(smtp_server.messages) == 3
+
+
+def test_resumes_after_interrupted_run(app, smtp_server):
+    book_tomorrow(7)
+    app.config['REMINDER_BATCH_SIZE'] = 3
+    ids = [r.id for r in Reservation.query.order_by(Reservation.id)]
+    now = datetime.utcnow()
+    # A crashed run: first chunk delivered, second claimed but never sent, the rest untouched
+    Reservation.query.filter(Reservation.id.in_(ids[:3])).update(
+        {'reminder_claimed_at': now, 'reminder_sent_at': now}, synchronize_session=False)
+    Reservation.query.filter(Reservation.id.in_(ids[3:6])).update(
+        {'reminder_claimed_at': now - timedelta(hours=1)}, synchronize_session=False)
+    db.session.commit()
+
+    report = send_reminders()
+
+    assert sorted(report.sent) == ids[3:]
+    assert len(smtp_server.messages) == 4
+
+
+def test_live_claim_is_not_sent_twice(app, smtp_server):
+    book_tomorrow(2)
+    claimed = Reservation.query.first()
+    claimed.reminder_claimed_at = datetime.utcnow()
+    db.session.commit()
+
+    report = send_reminders()
+
+    assert claimed.id not in report.sent
+    assert len(smtp_server.messages) == 1
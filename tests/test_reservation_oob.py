@@ -0,0 +1,56 @@
+from datetime import date, time
+from app import db
+from app.models import Reservation, Settings
+from app.stats import dashboard_stats
+
+HX = {'HX-Request': 'true'}
+
+
+def book(guests, status='pending'):
+    reservation = Reservation(date=date.today(), time=time(20, 0), guests=guests, first_name='A', last_name='B',
+                              email='a@example.com', phone='0600000000', status=status)
+    db.session.add(reservation)
+    db.session.commit()
+    return reservation.id
+
+
+def test_status_change_swaps_row_and_counters(app, admin_client):
+    Settings.set('CAPACITY', 40)
+    book(4)
+    rid = book(6)
+    # Warm the cache: the response must not serve these stale numbers
+    assert dashboard_stats()['fill_rate'] == 25.0
+
+    response = admin_client.post(f'/admin/reservations/{rid}/status', data={'status': 'cancelled'}, headers=HX)
+    html = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert '<html' not in html
+    assert f'<tr id="reservation-{rid}">' in html and 'Annulé' in html
+    assert '<div id="dashboard-today-count" hx-swap-oob="innerHTML">2</div>' in html
+    assert '<div id="dashboard-fill-rate" hx-swap-oob="innerHTML">10.0%</div>' in html
+    assert 'id="modal-container"' not in html
+
+
+def test_confirm_and_edit_push_counters(app, admin_client):
+    Settings.set('CAPACITY', 40)
+    rid = book(4)
+
+    html = admin_client.post(f'/admin/reservations/{rid}/confirm', headers=HX).get_data(as_text=True)
+    assert f'<tr id="reservation-{rid}">' in html and 'Confirmé' in html
+    assert 'hx-swap-oob="innerHTML">10.0%</div>' in html
+
+    html = admin_client.post(f'/admin/reservations/{rid}/edit', headers=HX, data={
+        'date': date.today().isoformat(), 'time': '20:00', 'guests': '8', 'status': 'confirmed', 'internal_notes': '',
+    }).get_data(as_text=True)
+    assert f'<tr id="reservation-{rid}">' in html
+    assert 'hx-swap-oob="innerHTML">20.0%</div>' in html
+    # The edit modal is closed by emptying its container
+    assert '<div id="modal-container" hx-swap-oob="true"></div>' in html
+
+
+def test_dashboard_counters_are_swap_targets(app, admin_client):
+    rid = book(2)
+    html = admin_client.get('/admin/dashboard').get_data(as_text=True)
+    assert 'id="dashboard-today-count"' in html and 'id="dashboard-fill-rate"' in html
+    # Recent bookings use the shared row, so status swaps work there too
+    assert f'<tr id="reservation-{rid}">' in html
@@ -0,0 +1,82 @@
+from datetime import date, time, timedelta
+from app import db, rollup
+from app.models import DailyStats, Reservation
+from app.stats import dashboard_stats
+
+DAY = date(2026, 3, 10)
+
+
+def book(day=DAY, at=time(20, 0), guests=2, status='confirmed'):
+    r = Reservation(date=day, time=at, guests=guests, first_name='A', last_name='B',
+                    email='a@example.com', phone='0600000000', status=status)
+    db.session.add(r)
+    db.session.commit()
+    return r
+
+
+def stored():
+    return {row.date: {c: getattr(row, c) for c in rollup.COUNTERS} for row in DailyStats.query}
+
+
+def recomputed():
+    current = stored()
+    rollup.refresh()
+    return current, stored()
+
+
+def test_writes_keep_rollup_in_step(app):
+    lunch = book(at=time(12, 30), guests=4)
+    dinner = book(guests=3, status='pending')
+    book(day=DAY + timedelta(days=1), guests=5)
+
+    row = DailyStats.query.get(DAY)
+    assert (row.reservations, row.covers, row.lunch_covers, row.dinner_covers) == (2, 7, 4, 3)
+    assert (row.confirmed, row.pending) == (1, 1)
+
+    dinner.status = 'cancelled'
+    lunch.time = time(19, 0)
+    db.session.commit()
+    lunch.date = DAY + timedelta(days=2)
+    db.session.commit()
+    db.session.delete(dinner)
+    db.session.commit()
+
+    incremental, full = recomputed()
+    assert incremental == full
+    assert DAY not in incremental
+    assert incremental[DAY + timedelta(days=2)]['dinner_covers'] == 4
+
+
+def test_backfill_command(app, runner):
+    db.session.execute(Reservation.__table__.insert(), [
+        {'date': DAY, 'time': time(12, 0), 'guests': 2, 'first_name': 'A', 'last_name': 'B',
+         'email': 'a@example.com', 'phone': '0600000000', 'status': 'completed'},
+    ] * 3)
+    db.session.commit()
+    assert DailyStats.query.count() == 0
+
+    result = runner.invoke(args=['backfill-daily-stats'])
+    assert 'for 1 day(s)' in result.output
+    row = DailyStats.query.get(DAY)
+    assert (row.reservations, row.lunch_covers, row.completed) == (3, 6, 3)
+
+
+def test_refresh_recent_reconciles_drift(app):
+    book(guests=4)
+    DailyStats.query.update({'covers': 99})
+    db.session.commit()
+
+    assert rollup.refresh_recent(timedelta(hours=1)) == 1
+    assert DailyStats.query.get(DAY).covers == 4
+
+
+def test_long_ranges_and_no_show_rate(app):
+    today = date.today()
+    book(day=today - timedelta(days=200), status='completed')
+    book(day=today - timedelta(days=100), status='completed')
+    book(day=today - timedelta(days=100), status='completed')
+    book(day=today - timedelta(days=50), status='confirmed')
+
+    stats = dashboard_stats(365)
+    assert sum(stats['values']) == 4
+    assert stats['no_show_rate'] == 25.0
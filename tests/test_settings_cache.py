@@ -0,0 +1,88 @@
+from sqlalchemy import event, update
+from app import db
+from app.models import Settings
+
+
+def count_settings_queries(app, fn):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if 'FROM settings' in statement:
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return len(statements)
+
+
+def test_set_invalidates_cache(app):
+    Settings.set('PHONE', '0102030405')
+    assert Settings.get('PHONE') == '0102030405'
+    Settings.set('PHONE', '0607080910')
+    assert Settings.get('PHONE') == '0607080910'
+
+    Settings.set('CLOSED_DATES', ['2026-12-25'], as_json=True)
+    assert Settings.get('CLOSED_DATES', as_json=True) == ['2026-12-25']
+    assert Settings.VERSION_KEY not in Settings.get_all()
+
+
+def test_pages_validate_settings_once_per_request(app, client):
+    Settings.set('ADDRESS', '1 Rue du Lagon')
+    client.get('/')
+
+    # Warm cache: only the version stamp is read, however many lookups the page does
+    assert count_settings_queries(app, lambda: client.get('/')) == 1
+    # Capacity, table duration and the template context share that one check
+    form = {'date': '2030-01-01', 'guests': '2'}
+    assert count_settings_queries(app, lambda: client.post('/api/check-availability', data=form)) == 1
+
+
+def test_other_worker_writes_are_picked_up(app, client):
+    Settings.set('ADDRESS', '1 Rue du Lagon')
+    assert b'1 Rue du Lagon' in client.get('/').data
+
+    # Simulate another worker writing through its own Settings.set
+    db.session.execute(update(Settings).where(Settings.key == 'ADDRESS').values(value='2 Avenue de la Mer'))
+    db.session.execute(update(Settings).where(Settings.key == Settings.VERSION_KEY).values(value='other-worker'))
+    db.session.commit()
+
+    assert b'2 Avenue de la Mer' in client.get('/').data
+
+
+def test_set_many_upserts_in_one_statement(app):
+    Settings.set('PHONE', '0102030405')
+    version = Settings.version()
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        Settings.set_many({'PHONE': '0607080910', 'CLOSED_DATES': ['2026-12-25'], 'CAPACITY': 40},
+                          json_keys=Settings.JSON_KEYS)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    writes = [s for s in statements if s.lstrip().upper().startswith(('INSERT', 'UPDATE'))]
+    assert len(writes) == 1 and 'ON CONFLICT' in writes[0]
+    assert Settings.get('PHONE') == '0607080910'
+    assert Settings.get('CLOSED_DATES', as_json=True) == ['2026-12-25']
+    assert Settings.get('CAPACITY') == '40'
+    assert Settings.version() != version
+
+
+def test_admin_settings_saves_with_set_many(app, admin_client):
+    resp = admin_client.post('/admin/settings', data={
+        'capacity': '60', 'table_duration': '90', 'address': '1 Rue du Lagon', 'phone': '0102030405',
+        'contact_email': 'contact@lelagon.com', 'closed_dates': '2026-12-24, 2026-12-25',
+        'notification_emails': 'chef@lelagon.com', 'opening_hours': '{"0": null}'})
+    assert resp.status_code == 302
+    assert Settings.get('CAPACITY') == '60'
+    assert Settings.get('TABLE_DURATION_MINUTES') == '90'
+    assert Settings.get('CLOSED_DATES', as_json=True) == ['2026-12-24', '2026-12-25']
+    assert Settings.get('OPENING_HOURS', as_json=True) == {'0': None}
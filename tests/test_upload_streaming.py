@@ -0,0 +1,84 @@
+import io
+import os
+from PIL import Image
+from app import db, images
+from app.images import UploadSink, sniff
+from app.models import Category, MenuItem
+
+
+def add_category():
+    category = Category(name='Plats', slug='plats')
+    db.session.add(category)
+    db.session.commit()
+    return category.id
+
+
+def encoded(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def add_item(client, category_id, data, filename='photo.png'):
+    return client.post('/admin/menu/add', content_type='multipart/form-data', data={
+        'name': 'Thiéboudienne', 'category_id': str(category_id), 'description': '', 'price': '16.00',
+        'is_available': 'true', 'image_file': (io.BytesIO(data), filename),
+    })
+
+
+def test_sniff():
+    image = Image.new('RGB', (8, 8))
+    for fmt, kind in (('JPEG', 'jpeg'), ('PNG', 'png'), ('GIF', 'gif'), ('WEBP', 'webp')):
+        assert sniff(encoded(image, fmt)[:12]) == kind
+    assert sniff(b'\x00\x00\x00\x1cftypavif') == 'avif'
+    assert sniff(b'<svg xmlns="http://www.w3.org/2000/svg">') is None
+    assert sniff(b'\x89PN') is None
+
+
+def test_sink_stops_storing_on_bad_magic(app):
+    sink = UploadSink(app.config['UPLOAD_FOLDER'], max_pixels=10 ** 6)
+    sink.write(b'MZ\x90\x00 not an image')
+    sink.write(b'x' * 1024 * 1024)
+    assert sink.error and os.path.getsize(sink.name) == 0
+    sink.close()
+    assert not os.path.exists(sink.name)
+
+
+def test_decompression_bomb_rejected_before_decoding(app, admin_client, monkeypatch):
+    category_id = add_category()
+    decoded = []
+    monkeypatch.setattr(images, 'render_variants', lambda *args: decoded.append(args))
+    # 100 megapixels that compress to a few kilobytes
+    bomb = encoded(Image.new('1', (10000, 10000)), 'PNG')
+    assert len(bomb) < 100 * 1024
+
+    response = add_item(admin_client, category_id, bomb)
+    assert response.status_code == 200
+    assert decoded == []
+    assert MenuItem.query.one().image_url is None
+    assert os.listdir(app.config['UPLOAD_FOLDER']) == []
+
+
+def test_upload_is_streamed_to_a_temporary_file(app, admin_client, monkeypatch):
+    category_id = add_category()
+    sources = []
+    render = images.render_variants
+
+    def spy(source, work, *args):
+        sources.append((source, os.path.getsize(source), work))
+        return render(source, work, *args)
+
+    monkeypatch.setattr(images, 'render_variants', spy)
+    data = encoded(Image.new('RGB', (640, 480), (10, 80, 160)), 'JPEG')
+    add_item(admin_client, category_id, data, filename='photo.jpg')
+
+    [(source, size, work)] = sources
+    # Written by the form parser outside static/, then removed with the request
+    assert os.path.dirname(source) == images.temp_folder()
+    assert not source.startswith(app.config['UPLOAD_FOLDER'])
+    assert os.path.basename(source).startswith('.') and size == len(data)
+    assert not os.path.exists(source)
+    # Variants are rendered next to it and only the finished files published
+    assert os.path.dirname(work) == images.temp_folder() and not os.path.exists(work)
+    assert all(not name.startswith('.') for name in os.listdir(app.config['UPLOAD_FOLDER']))
+    assert MenuItem.query.one().image_url.endswith('-640.webp')